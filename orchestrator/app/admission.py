@@ -0,0 +1,144 @@
+# app/admission.py
+"""
+Admission control for /api/chat.
+
+- per-IP token bucket + global in-flight cap, checked in middleware before the
+  request ever reaches the threadpool (cheap 429/503 under a burst)
+- per-session token bucket, checked once the form is parsed
+- a bounded number of concurrent pipeline runs (verify -> underwrite -> sanction);
+  callers wait at most SANCTION_WAIT_SECS for a slot, then get a 503
+
+Every rejection carries Retry-After. snapshot() feeds GET /api/metrics.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from app.config import settings
+
+class Rejected(Exception):
+    def __init__(self, status: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+class TokenBuckets:
+    """One token bucket per key, LRU-bounded so a scan of fake session ids cannot grow memory."""
+
+    def __init__(self, rate: float, burst: int, max_keys: int = 100_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str) -> float:
+        """Spend one token. Returns 0 if allowed, else seconds until a token is available."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            b = self._buckets.get(key)
+            if b is None:
+                b = [float(self.burst), now]
+                self._buckets[key] = b
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                b[0] = min(self.burst, b[0] + (now - b[1]) * self.rate)
+                b[1] = now
+            if b[0] >= 1:
+                b[0] -= 1
+                return 0.0
+            return (1 - b[0]) / self.rate
+
+per_ip = TokenBuckets(settings.rl_ip_rate, settings.rl_ip_burst)
+per_session = TokenBuckets(settings.rl_session_rate, settings.rl_session_burst)
+
+_sanction = threading.BoundedSemaphore(max(1, settings.sanction_concurrency))
+_lock = threading.Lock()
+METRICS = {
+    "chat_inflight": 0,
+    "chat_admitted": 0,
+    "sanction_inflight": 0,
+    "sanction_waiting": 0,
+    "rejected_ip": 0,
+    "rejected_session": 0,
+    "rejected_inflight": 0,
+    "rejected_sanction": 0,
+}
+
+def _bump(key: str, by: int = 1):
+    with _lock:
+        METRICS[key] += by
+
+def snapshot() -> dict:
+    with _lock:
+        return dict(METRICS)
+
+def check_session(session_id: str):
+    wait = per_session.take(session_id)
+    if wait:
+        _bump("rejected_session")
+        raise Rejected(429, "Too many messages for this session", wait)
+
+@contextmanager
+def sanction_slot():
+    """Hold one of SANCTION_CONCURRENCY pipeline slots, or raise Rejected(503)."""
+    _bump("sanction_waiting")
+    try:
+        ok = _sanction.acquire(timeout=settings.sanction_wait_secs)
+    finally:
+        _bump("sanction_waiting", -1)
+    if not ok:
+        _bump("rejected_sanction")
+        raise Rejected(503, "Sanction capacity exhausted", settings.sanction_wait_secs)
+    _bump("sanction_inflight")
+    try:
+        yield
+    finally:
+        _bump("sanction_inflight", -1)
+        _sanction.release()
+
+def _reject(exc: Rejected) -> JSONResponse:
+    return JSONResponse(
+        {"reply": "We're handling a lot of requests right now. Please retry shortly.", "error": exc.reason},
+        status_code=exc.status,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+def add_admission(app: FastAPI) -> None:
+    """Install the /api/chat gate and map Rejected to 429/503 responses."""
+
+    @app.exception_handler(Rejected)
+    async def _on_rejected(request: Request, exc: Rejected):
+        return _reject(exc)
+
+    @app.middleware("http")
+    async def _admit(request: Request, call_next):
+        if request.url.path != "/api/chat" or request.method != "POST":
+            return await call_next(request)
+
+        ip = request.client.host if request.client else "-"
+        wait = per_ip.take(ip)
+        if wait:
+            _bump("rejected_ip")
+            return _reject(Rejected(429, "Too many requests from this address", wait))
+
+        # middleware runs on the event loop, so this check-and-increment cannot interleave
+        if METRICS["chat_inflight"] >= settings.chat_max_inflight:
+            _bump("rejected_inflight")
+            return _reject(Rejected(503, "Server busy", 1))
+        _bump("chat_inflight")
+        _bump("chat_admitted")
+        try:
+            return await call_next(request)
+        finally:
+            _bump("chat_inflight", -1)
@@ -1,6 +1,11 @@
 # app/agents/master.py
-from app.events import append_event, get_or_create_session, save_session
+from app.events import get_or_create_session, save_session, record
 from app.agents import verification, underwriting, sanction
+from app.admission import sanction_slot
+from app.config import settings
+from app.pdf.render import PdfBudgetExceeded
+from app.services.resilience import deadline, stage, ServiceUnavailable
+from app.tracing import span
 
 def _normalize(form: dict) -> dict:
     f = dict(form or {})
@@ -20,68 +25,89 @@ def _normalize(form: dict) -> dict:
     return f
 
 def handle_message(session_id: str, msg: str, form: dict) -> dict:
+    with span("master.handle_message", session=session_id):
+        return _handle(session_id, msg, form)
+
+def _handle(session_id: str, msg: str, form: dict) -> dict:
     form = _normalize(form)
     state = get_or_create_session(session_id)
-    history = state.get("history", [])
-    history.append({"role": "user", "content": msg})
-    state["history"] = history
+    ev = []  # events for this turn; committed with each save_session
+    record(ev, state, "message", {"role": "user", "content": msg})
 
     if state.get("stage") == "start":
-        state["stage"] = "precheck"
-        save_session(session_id, state)
-        append_event(session_id, "stage", "precheck")
+        record(ev, state, "stage", "precheck")
+        save_session(session_id, state, events=ev)
         return {"reply": "Got consent. Share name, mobile, PAN last 4."}
 
     if state.get("stage") == "precheck":
-        # store the basic identity fields
-        state.update({
-            "name": form.get("name") or "",
-            "mobile": form.get("mobile") or "",
-            "pan_tail": form.get("pan_tail") or "",   # normalized
-        })
-        state["stage"] = "verify"
-        append_event(session_id, "precheck", {
-            "name": state["name"],
-            "mobile": state["mobile"],
-            "pan_tail": state["pan_tail"],
-        })
+        # the full pipeline is the expensive path; bounded concurrency, 503 when saturated
+        with sanction_slot(), deadline(settings.request_budget):
+            return _run_pipeline(session_id, state, form, ev)
+
+    return {"reply": "Session complete."}
 
+def _manual_review(session_id: str, state: dict, ev: list) -> dict:
+    record(ev, state, "stage", "manual_review")
+    save_session(session_id, state, events=ev)
+    return {"reply": "We queued this for manual review.", "handoff": True}
+
+def _run_pipeline(session_id: str, state: dict, form: dict, ev: list) -> dict:
+    # store the basic identity fields
+    record(ev, state, "precheck", {
+        "name": form.get("name") or "",
+        "mobile": form.get("mobile") or "",
+        "pan_tail": form.get("pan_tail") or "",   # normalized
+    })
+    record(ev, state, "stage", "verify")
+
+    with stage("verify"), span("agent.verification.run"):
         v = verification.run(state)  # expected: {"ok": bool, ...}
-        state["verify"] = v
-        if not v.get("ok"):
-            state["stage"] = "manual_review"
-            save_session(session_id, state)
-            return {"reply": "We queued this for manual review.", "handoff": True}
+    record(ev, state, "verify", v)
+    if not v.get("ok"):
+        return _manual_review(session_id, state, ev)
 
-        state["stage"] = "underwrite"
-        save_session(session_id, state)
+    record(ev, state, "stage", "underwrite")
+    save_session(session_id, state, events=ev)
 
+    with stage("underwrite"), span("agent.underwriting.run"):
         u = underwriting.run({
             **state,
             "desired_amount": form.get("desired_amount", 150000),
             "tenure": form.get("tenure", 24),
             "salary": form.get("salary", 0),
         })
-        state["underwrite"] = u
-        if not u.get("approve"):
-            state["stage"] = "declined"
-            save_session(session_id, state)
-            return {"reply": f"Sorry, declined - reason: {u['reason']} (score {u['score']})."}
+    record(ev, state, "underwrite", u)
+    if u.get("manual_review"):
+        return _manual_review(session_id, state, ev)
+    if not u.get("approve"):
+        record(ev, state, "stage", "declined")
+        save_session(session_id, state, events=ev)
+        return {"reply": f"Sorry, declined - reason: {u['reason']} (score {u['score']})."}
 
-        state["stage"] = "sanction"
-        save_session(session_id, state)
+    record(ev, state, "stage", "sanction")
+    save_session(session_id, state, events=ev)
 
-        s = sanction.run(session_id, u, state)
-        state["sanction"] = s
-        state["stage"] = "done"
-        save_session(session_id, state)
+    try:
+        with stage("sanction"), span("agent.sanction.run"):
+            s = sanction.run(session_id, u, state)
+    except ServiceUnavailable as e:
+        record(ev, state, "sanction", {"ok": False, "reason": f"{e.service} unavailable"})
+        return _manual_review(session_id, state, ev)
+    except PdfBudgetExceeded as e:
+        # mandate may already exist; an operator reissues the letter
+        record(ev, state, "sanction", {"ok": False, "reason": f"letter over render budget: {e}"})
+        return _manual_review(session_id, state, ev)
+    crm_update = s.pop("crm", None)
+    record(ev, state, "sanction", s)
+    record(ev, state, "stage", "done")
+    save_session(session_id, state, events=ev, outbox=[
+        {"kind": "crm.update_customer", "payload": crm_update},
+    ] if crm_update else None)
 
-        # return dict KFS plus a direct link for download
-        return {
-            "reply": "Sanctioned. Your PDF + KFS is ready.",
-            "pdf": s["pdf"],
-            "kfs": s["kfs"],
-            "kfs_url": s.get("kfs_url"),
-        }
-
-    return {"reply": "Session complete."}
+    # return dict KFS plus a direct link for download
+    return {
+        "reply": "Sanctioned. Your PDF + KFS is ready.",
+        "pdf": s["pdf"],
+        "kfs": s["kfs"],
+        "kfs_url": s.get("kfs_url"),
+    }
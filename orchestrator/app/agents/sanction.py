@@ -1,11 +1,10 @@
-from pathlib import Path
 import json
 
 from app.pdf.sanction_letter import generate_pdf
-from app.services import mandate, crm
+from app.services import mandate
+from app.services.resilience import call
 from app.audit import check
-
-DATA_DIR = Path("/app/data")
+from app.storage import doc_path, served_url
 
 def run(session_id: str, decision: dict, customer: dict) -> dict:
     # Guardrails (non-blocking in demo)
@@ -14,7 +13,8 @@ def run(session_id: str, decision: dict, customer: dict) -> dict:
     except Exception:
         pass
 
-    md = mandate.create_mandate(session_id, bank="HDFC", upi="test@upi")
+    # not hedged: creating a mandate is a write. ServiceUnavailable propagates to master.
+    md = call("mandate", mandate.create_mandate, session_id, bank="HDFC", upi="test@upi")
 
     # Derive PAN last 4 robustly
     pan_src = (customer.get("pan_last4")
@@ -34,27 +34,29 @@ def run(session_id: str, decision: dict, customer: dict) -> dict:
         "MandateID": md.get("mandate_id"),
     }
 
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
-
-    # Generate PDF
-    pdf_fs = DATA_DIR / f"sanction_{session_id}.pdf"
+    # Generate PDF (sharded under /app/data/docs, see app/storage.py)
+    pdf_fs = doc_path("sanction", session_id, "pdf")
     generate_pdf(str(pdf_fs), kfs)
 
     # Persist the exact KFS shown to user
-    kfs_fs = DATA_DIR / f"kfs_{session_id}.json"
-    with kfs_fs.open("w", encoding="utf-8") as f:
+    kfs_fs = doc_path("kfs", session_id, "json")
+    kfs_tmp = kfs_fs.with_suffix(".json.tmp")
+    with kfs_tmp.open("w", encoding="utf-8") as f:
         json.dump(kfs, f, ensure_ascii=False, indent=2)
+    kfs_tmp.replace(kfs_fs)
 
     try:
         check("agent:sanction", "write", "crm", {"file": str(pdf_fs)})
     except Exception:
         pass
-    crm.update_customer(session_id, {"kfs": kfs, "pdf": str(pdf_fs)})
 
-    # Return browser-accessible URLS plus parsed kfs for on-screen summary
+    # Return browser-accessible URLS plus parsed kfs for on-screen summary.
+    # The CRM update is not sent here: the caller queues `crm` in the outbox
+    # together with the session save, and the dispatcher delivers it.
     return {
         "ok": True,
-        "pdf": f"/files/{pdf_fs.name}",
+        "pdf": served_url(pdf_fs),
         "kfs": kfs,
-        "kfs_url": f"/files/{kfs_fs.name}",
+        "kfs_url": served_url(kfs_fs),
+        "crm": {"kfs": kfs, "pdf": str(pdf_fs)},
     }
@@ -1,13 +1,9 @@
-import yaml
-from pathlib import Path
-
+from app import refdata
+from app.quotes import get_quote
 from app.services import bureau
+from app.services.resilience import call, ServiceUnavailable
 from app.audit import check
 
-RULES = yaml.safe_load(
-    Path(__file__).resolve().parents[1].joinpath("rules/policy.yaml").read_text()
-)
-
 def _get_pan(payload: dict) -> str:
     """Normalize PAN last-4 from pan_last4 / pan_tail / pan."""
     v = payload.get("pan_last4") or payload.get("pan_tail") or payload.get("pan") or ""
@@ -21,9 +17,14 @@ def _to_int(value, default: int) -> int:
         return default
 
 def run(payload: dict) -> dict:
+    # Reference tables for this request (policy + pre-approved limits)
+    ref = refdata.current()
+    rules = ref.policy
+
     # Normalize inputs
     pan = _get_pan(payload)
-    preapproved = _to_int(payload.get("preapproved", 200000), 200000)
+    preapproved = payload.get("preapproved") or ref.preapproved_limit(payload.get("mobile"), pan)
+    preapproved = _to_int(preapproved or 200000, 200000)
     desired = _to_int(payload.get("desired_amount", preapproved), preapproved)
     tenure = _to_int(payload.get("tenure", 24), 24)
 
@@ -32,26 +33,27 @@ def run(payload: dict) -> dict:
         pass
 
     # Bureau score (service itself should be defensive too)
-    sc = bureau.pull_score(pan)["score"]
+    try:
+        sc = call("bureau", bureau.pull_score, pan)["score"]
+    except ServiceUnavailable as e:
+        return {"approve": False, "manual_review": True, "reason": f"{e.service} unavailable", "score": None}
 
     # Policy checks
-    min_cs = RULES["eligibility"]["min_credit_score"]
-    multiplier = RULES["eligibility"]["preapproved_multiplier"]
+    min_cs = rules["eligibility"]["min_credit_score"]
+    multiplier = rules["eligibility"]["preapproved_multiplier"]
     max_allowed = preapproved * multiplier
 
     if sc < min_cs or desired > max_allowed:
         return {"approve": False, "reason": "Policy breach", "score": sc}
 
-    # Offer math (simple EMI)
-    apr = RULES["offers"]["default_apr"]
-    r = apr / 12 / 100
-    emi = int(desired * r * (1 + r) ** tenure / ((1 + r) ** tenure - 1))
+    # Offer math (simple EMI); preset amount/tenure pairs are precomputed
+    quote, _ = get_quote(desired, tenure)
 
     return {
         "approve": True,
         "score": sc,
-        "apr": apr,
-        "emi": emi,
+        "apr": quote["apr"],
+        "emi": quote["emi"],
         "amount": desired,
         "tenure": tenure,
     }
@@ -1,4 +1,5 @@
 from app.services import ckyc, aa
+from app.services.resilience import call, ServiceUnavailable
 from app.audit import check
 
 # app/agents/verification.py
@@ -7,4 +8,22 @@ def run(payload: dict) -> dict:
     mobile = payload.get("mobile", "")
     pan_tail = payload.get("pan_tail") or payload.get("pan_last4") or ""
     ok = bool(name and len(mobile) == 10 and len(pan_tail) == 4)
-    return {"ok": ok, "mobile": mobile, "pan_tail": pan_tail}
+    if not ok:
+        return {"ok": ok, "mobile": mobile, "pan_tail": pan_tail}
+
+    check("agent:verification", "read", "ckyc", {"pan_last4": pan_tail})
+    check("agent:verification", "read", "aa", {"mobile": mobile})
+    try:
+        kyc = call("ckyc", ckyc.verify_basic, name, pan_tail)
+        income = call("aa", aa.fetch_income_band, mobile)
+    except ServiceUnavailable as e:
+        # provider down or too slow: a human picks it up
+        return {"ok": False, "mobile": mobile, "pan_tail": pan_tail,
+                "manual_review": True, "reason": f"{e.service} unavailable"}
+
+    return {
+        "ok": bool(kyc.get("match")),
+        "mobile": mobile,
+        "pan_tail": pan_tail,
+        "income_band": income.get("income_band"),
+    }
@@ -1,4 +1,5 @@
 from app.models import SessionLocal, Audit
+from app.tracing import span
 
 ALLOWED = {
     "agent:verification": {"ckyc.read","aa.read"},
@@ -12,5 +13,6 @@ def check(actor: str, action: str, resource: str, meta: dict=None):
     result = "ok" if scope in ALLOWED.get(actor, set()) else "alert"
     with SessionLocal() as db:
         db.add(Audit(actor=actor, action=action, resource=resource, meta=meta or {}, result=result))
-        db.commit()
+        with span("db.commit", table="audit"):
+            db.commit()
     return result == "ok"
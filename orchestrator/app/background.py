@@ -0,0 +1,84 @@
+# app/background.py
+"""
+Run the background workers (outbox Dispatcher, retention Collector) in one
+process only.
+
+With `uvicorn --workers N` every worker runs the lifespan. Each one starts a
+Leader thread that polls for an exclusive flock on BACKGROUND_LOCK. The
+worker holding it runs the background threads. If that worker dies, the OS
+drops the lock and another worker takes over within BACKGROUND_POLL_SECS.
+BACKGROUND_WORKERS=0 turns them off in this deployment, e.g. when they run in
+a separate container.
+"""
+import logging
+import os
+import threading
+from typing import Callable, List, Optional
+
+from app.config import settings
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX dev machines: single process, no lock needed
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+class Leader:
+    """Start `factories()` once this process holds the background lock; stop them on shutdown."""
+
+    def __init__(self, factories: Callable[[], List], lock_path: Optional[str] = None, poll: Optional[float] = None):
+        self.factories = factories
+        self.lock_path = lock_path or settings.background_lock
+        self.poll = poll if poll is not None else settings.background_poll
+        self.workers: List = []
+        self._fd: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def leading(self) -> bool:
+        return bool(self.workers)
+
+    def start(self):
+        if not settings.background_workers or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="background-leader", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        for w in reversed(self.workers):
+            w.stop()
+        self.workers = []
+        if self._fd is not None:
+            os.close(self._fd)  # releases the flock
+            self._fd = None
+
+    def _try_lock(self) -> bool:
+        if fcntl is None:
+            return True
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                if self._try_lock():
+                    log.info("background workers started in pid %s", os.getpid())
+                    self.workers = self.factories()
+                    for w in self.workers:
+                        w.start()
+                    return
+            except Exception:
+                log.exception("background leader election failed")
+            self._stop.wait(self.poll)
@@ -5,5 +5,47 @@ class Settings(BaseModel):
     port: int = int(os.getenv("ORCH_PORT", 8000))
     db_url: str = os.getenv("DATABASE_URL", "sqlite:///./orchestrator.db")
     allowed_origins: list[str] = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000").split(",")
+    # PDF rendering budgets (0 disables the check)
+    pdf_max_bytes: int = int(os.getenv("PDF_MAX_BYTES", 0))
+    pdf_max_peak_mem: int = int(os.getenv("PDF_MAX_PEAK_MEM", 0))
+    pdf_track_mem: bool = os.getenv("PDF_TRACK_MEM", "0") == "1"
+    # Admission control for /api/chat (rates are tokens per second)
+    rl_ip_rate: float = float(os.getenv("RL_IP_RATE", 5))
+    rl_ip_burst: int = int(os.getenv("RL_IP_BURST", 20))
+    rl_session_rate: float = float(os.getenv("RL_SESSION_RATE", 1))
+    rl_session_burst: int = int(os.getenv("RL_SESSION_BURST", 5))
+    chat_max_inflight: int = int(os.getenv("CHAT_MAX_INFLIGHT", 64))
+    sanction_concurrency: int = int(os.getenv("SANCTION_CONCURRENCY", 4))
+    sanction_wait_secs: float = float(os.getenv("SANCTION_WAIT_SECS", 2))
+    # Outbox delivery (CRM side effects)
+    crm_url: str = os.getenv("CRM_URL", "")
+    crm_timeout: float = float(os.getenv("CRM_TIMEOUT", 5))
+    outbox_batch: int = int(os.getenv("OUTBOX_BATCH", 50))
+    outbox_interval: float = float(os.getenv("OUTBOX_INTERVAL", 1))
+    outbox_max_attempts: int = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 8))
+    # External adapters: overall pipeline deadline and breaker tuning
+    request_budget: float = float(os.getenv("REQUEST_BUDGET_SECS", 8))
+    breaker_threshold: int = int(os.getenv("BREAKER_THRESHOLD", 5))
+    breaker_reset_secs: float = float(os.getenv("BREAKER_RESET_SECS", 30))
+    adapter_pool_size: int = int(os.getenv("ADAPTER_POOL_SIZE", 32))
+    # Retention GC for sessions and generated documents
+    session_abandon_hours: float = float(os.getenv("SESSION_ABANDON_HOURS", 24))
+    doc_retention_days: float = float(os.getenv("DOC_RETENTION_DAYS", 0))  # 0 = never expire documents
+    doc_archive_dir: str = os.getenv("DOC_ARCHIVE_DIR", "")  # empty = delete expired documents
+    doc_expire_done: bool = os.getenv("DOC_EXPIRE_DONE", "0") == "1"  # also expire letters of completed sessions
+    gc_interval: float = float(os.getenv("GC_INTERVAL_SECS", 3600))
+    gc_max_sessions: int = int(os.getenv("GC_MAX_SESSIONS", 500))
+    gc_max_files: int = int(os.getenv("GC_MAX_FILES", 2000))
+    gc_vacuum_pages: int = int(os.getenv("GC_VACUUM_PAGES", 2000))
+    # Background threads (outbox, retention) run in one process per deployment
+    background_workers: bool = os.getenv("BACKGROUND_WORKERS", "1") == "1"
+    background_lock: str = os.getenv("BACKGROUND_LOCK", "/app/data/.background.lock")
+    background_poll: float = float(os.getenv("BACKGROUND_POLL_SECS", 10))
+    # Event sourcing: write a state snapshot after this many events
+    snapshot_every: int = int(os.getenv("SNAPSHOT_EVERY", 20))
+    # Tracing: export target (file:<path> | otlp:<url> | empty) and tail sampling
+    trace_export: str = os.getenv("TRACE_EXPORT", "")
+    trace_slow_ms: float = float(os.getenv("TRACE_SLOW_MS", 1000))
+    trace_sample_rate: float = float(os.getenv("TRACE_SAMPLE_RATE", 0.01))
 
 settings = Settings()
@@ -18,7 +18,7 @@ def add_cors(app: FastAPI) -> None:
         allow_origins=["*"] if allow_all else origins,
         allow_methods=["*"],
         allow_headers=["*"],
-        expose_headers=["Content-Disposition"],
+        expose_headers=["Content-Disposition", "Retry-After", "X-Trace-Id"],
         allow_credentials=False,  # keep False unless you send cookies/Authorization
         max_age=86400,
     )
@@ -1,19 +1,60 @@
-from app.models import SessionLocal, Event, Session
+import copy
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select
+
+from app.config import settings
+from app.models import SessionLocal, Event, Session, Snapshot
+from app import outbox as _outbox
+from app.tracing import span
+
+# Every change the master makes to a session is an event. `apply` folds one
+# event into a state dict, so any state = latest snapshot + events after it.
+# Session.state is still written on every save as the fast read path.
+TERMINAL = {"done", "declined", "manual_review"}
+
+def initial_state() -> dict:
+    return {"stage": "start", "history": []}
+
+def apply(state: dict, type_: str, payload) -> dict:
+    if type_ == "message":
+        state.setdefault("history", []).append(payload)
+    elif type_ == "stage":
+        state["stage"] = payload if isinstance(payload, str) else payload["stage"]
+    elif type_ == "precheck":
+        state.update(payload)
+    elif type_ in ("verify", "underwrite", "sanction"):
+        state[type_] = payload
+    return state
+
+def record(pending: List[Tuple[str, object]], state: dict, type_: str, payload) -> None:
+    """Apply an event to `state` and queue it for the next save_session."""
+    apply(state, type_, payload)
+    pending.append((type_, copy.deepcopy(payload)))
 
 def append_event(session_id: str, type_: str, payload: dict):
     with SessionLocal() as db:
         db.add(Event(session_id=session_id, type=type_, payload=payload))
-        db.commit()
+        with span("db.commit", table="events"):
+            db.commit()
 
 def get_or_create_session(session_id: str) -> dict:
     with SessionLocal() as db:
         s = db.get(Session, session_id)
         if not s:
-            s = Session(id=session_id, state={"stage":"start","history":[]})
-            db.add(s); db.commit()
+            s = Session(id=session_id, state=initial_state())
+            db.add(s)
+            with span("db.commit", table="sessions"):
+                db.commit()
         return s.state
 
-def save_session(session_id: str, state: dict):
+def save_session(session_id: str, state: dict, outbox: list[dict] = None, events: list = None):
+    """
+    Persist state. `events` (from record) and `outbox` items ({"kind", "payload",
+    optional "dedup_key"}) commit in the same transaction. A snapshot is taken
+    every SNAPSHOT_EVERY events and whenever the session reaches a terminal stage.
+    """
     with SessionLocal() as db:
         s = db.get(Session, session_id)
         if not s:
@@ -21,4 +62,68 @@ def save_session(session_id: str, state: dict):
             db.add(s)
         else:
             s.state = state
-        db.commit()
+        rows = [Event(session_id=session_id, type=t, payload=p) for t, p in events or ()]
+        db.add_all(rows)
+        for item in outbox or ():
+            _outbox.add(db, item["kind"], session_id, item["payload"], item.get("dedup_key"))
+        if rows:
+            db.flush()
+            last_snap = db.execute(
+                select(func.max(Snapshot.event_id)).where(Snapshot.session_id == session_id)
+            ).scalar() or 0
+            since = db.execute(
+                select(func.count()).select_from(Event)
+                .where(Event.session_id == session_id, Event.id > last_snap)
+            ).scalar()
+            if since >= settings.snapshot_every or state.get("stage") in TERMINAL:
+                db.add(Snapshot(session_id=session_id, event_id=rows[-1].id, state=copy.deepcopy(state)))
+        if events is not None:
+            events.clear()
+        with span("db.commit", table="sessions", events=len(rows)):
+            db.commit()
+
+def _bounds(q, col_id, col_at, at_event: Optional[int], at_time: Optional[datetime]):
+    if at_event is not None:
+        q = q.where(col_id <= at_event)
+    if at_time is not None:
+        q = q.where(col_at <= at_time)
+    return q
+
+def rebuild(session_id: str, at_event: Optional[int] = None, at_time: Optional[datetime] = None) -> dict:
+    """State of a session as of an event id or a point in time: nearest snapshot + the events after it."""
+    with SessionLocal() as db:
+        snap = db.execute(
+            _bounds(select(Snapshot).where(Snapshot.session_id == session_id),
+                    Snapshot.event_id, Snapshot.created_at, at_event, at_time)
+            .order_by(Snapshot.event_id.desc()).limit(1)
+        ).scalars().first()
+        state = copy.deepcopy(snap.state) if snap else initial_state()
+        q = select(Event.type, Event.payload).where(Event.session_id == session_id)
+        if snap:
+            q = q.where(Event.id > snap.event_id)
+        for type_, payload in db.execute(_bounds(q, Event.id, Event.created_at, at_event, at_time).order_by(Event.id)):
+            apply(state, type_, payload)
+        return state
+
+def rebuild_many(session_ids: Iterable[str]) -> Dict[str, dict]:
+    """Current state for a batch of sessions with two queries, for bulk replay."""
+    ids = list(session_ids)
+    out: Dict[str, dict] = {sid: initial_state() for sid in ids}
+    with SessionLocal() as db:
+        latest = (
+            select(Snapshot.session_id, func.max(Snapshot.event_id).label("event_id"))
+            .where(Snapshot.session_id.in_(ids)).group_by(Snapshot.session_id).subquery()
+        )
+        for sid, state in db.execute(
+            select(Snapshot.session_id, Snapshot.state)
+            .join(latest, (Snapshot.session_id == latest.c.session_id) & (Snapshot.event_id == latest.c.event_id))
+        ):
+            out[sid] = state
+        for sid, type_, payload in db.execute(
+            select(Event.session_id, Event.type, Event.payload)
+            .outerjoin(latest, Event.session_id == latest.c.session_id)
+            .where(Event.session_id.in_(ids), Event.id > func.coalesce(latest.c.event_id, 0))
+            .order_by(Event.session_id, Event.id)
+        ):
+            apply(out[sid], type_, payload)
+    return out
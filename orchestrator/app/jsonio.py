@@ -0,0 +1,78 @@
+# app/jsonio.py
+"""
+JSON encode/decode used for the DB JSON columns (Session.state, Event.payload,
+Audit.meta, Outbox.payload) and for API responses.
+
+Uses orjson when installed and falls back to the stdlib. Both write plain
+JSON text, so rows written by either backend are readable by the other: orjson
+writes compact UTF-8, and the stdlib keeps its default spacing and ASCII
+escapes. Set JSON_BACKEND=stdlib to force the fallback.
+
+Run `python -m app.jsonio` to benchmark on a realistic large session state.
+"""
+import json
+import os
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+if os.getenv("JSON_BACKEND", "").lower() == "stdlib":
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "stdlib"
+
+if orjson is not None:
+    _OPTS = orjson.OPT_NON_STR_KEYS  # stdlib coerces int keys to strings; keep that working
+
+    def dumps_bytes(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=_OPTS)
+
+    def dumps(obj: Any) -> str:
+        return orjson.dumps(obj, option=_OPTS).decode("utf-8")
+
+    loads = orjson.loads
+else:
+    def dumps_bytes(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def dumps(obj: Any) -> str:
+        return json.dumps(obj)
+
+    loads = json.loads
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with the active backend."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps_bytes(content)
+
+if __name__ == "__main__":
+    import timeit
+
+    state = {
+        "stage": "done",
+        "name": "Gautam Govind", "mobile": "9000000001", "pan_tail": "1234",
+        "history": [{"role": "user", "content": f"message {i} – ₹{i * 1000} for {i % 36} months"} for i in range(500)],
+        "verify": {"ok": True, "mobile": "9000000001", "pan_tail": "1234", "income_band": "40-60k"},
+        "underwrite": {"approve": True, "score": 740, "apr": 18.0, "emi": 7488, "amount": 150000, "tenure": 24},
+        "sanction": {
+            "ok": True, "pdf": "/files/docs/8b/e6/sanction_sess_e0.pdf",
+            "kfs": {"Name": "Gautam Govind", "PAN last 4": "1234", "Amount": 150000, "Tenure": 24,
+                    "EMI": 7488, "APR": "18.0%", "MandateID": "MDT-sess_e0"},
+            "schedule": [{"month": m, "emi": 7488, "principal": 5238 + m, "interest": 2250 - m} for m in range(1, 37)],
+        },
+    }
+    std_text = json.dumps(state)
+    assert loads(std_text) == state and json.loads(dumps(state)) == state
+
+    n = 500
+    print(f"backend={BACKEND} state={len(std_text)} bytes")
+    print(f"stdlib dumps {timeit.timeit(lambda: json.dumps(state), number=n) / n * 1e6:8.1f} us")
+    print(f"stdlib loads {timeit.timeit(lambda: json.loads(std_text), number=n) / n * 1e6:8.1f} us")
+    print(f"{BACKEND:6s} dumps {timeit.timeit(lambda: dumps(state), number=n) / n * 1e6:8.1f} us")
+    print(f"{BACKEND:6s} loads {timeit.timeit(lambda: loads(std_text), number=n) / n * 1e6:8.1f} us")
@@ -1,20 +1,36 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
-from pathlib import Path
 
 from app.models import init_db
 from app.deps import add_cors
-from app.routers import health, chat
+from app.admission import add_admission
+from app.background import Leader
+from app.outbox import Dispatcher
+from app.retention import Collector
+from app.storage import DATA_DIR, DocFiles
+from app.tracing import add_tracing
+from app.routers import health, chat, quote
 
-app = FastAPI(title="GreenLight Orchestrator")
-add_cors(app)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # deliver queued CRM updates off the request path; expire old sessions/documents.
+    # With several uvicorn workers only the one holding the background lock runs them.
+    leader = Leader(lambda: [Dispatcher(), Collector()])
+    leader.start()
+    yield
+    leader.stop()
+
+app = FastAPI(title="GreenLight Orchestrator", lifespan=lifespan)
+add_admission(app)
+add_tracing(app)  # outside admission so shed requests are traced too
+add_cors(app)  # added last so CORS wraps 429/503 responses too
 init_db()
 
-# Serve generated documents
-DATA_DIR = "/app/data"
-Path(DATA_DIR).mkdir(parents=True, exist_ok=True)
-app.mount("/files", StaticFiles(directory=DATA_DIR), name="files")
+# Serve generated documents (only those: DATA_DIR also holds reference data)
+DATA_DIR.mkdir(parents=True, exist_ok=True)
+app.mount("/files", DocFiles(directory=DATA_DIR), name="files")
 
 # API routers
 app.include_router(health.router, prefix="/api")
 app.include_router(chat.router, prefix="/api")
+app.include_router(quote.router, prefix="/api")
@@ -2,8 +2,13 @@ from sqlalchemy import create_engine, Column, Integer, String, JSON, DateTime, T
 from sqlalchemy.orm import declarative_base, sessionmaker
 from sqlalchemy.sql import func
 from app.config import settings
+from app import jsonio, tracing
 
-engine = create_engine(settings.db_url, echo=False, future=True)
+engine = create_engine(
+    settings.db_url, echo=False, future=True,
+    json_serializer=jsonio.dumps, json_deserializer=jsonio.loads,
+)
+tracing.instrument_engine(engine)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 Base = declarative_base()
 
@@ -21,6 +26,14 @@ class Event(Base):
     payload = Column(JSON)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+class Snapshot(Base):
+    __tablename__ = "snapshots"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    session_id = Column(String, index=True)
+    event_id = Column(Integer, index=True)   # last event folded into `state`
+    state = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
 class Audit(Base):
     __tablename__ = "audit"
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -31,5 +44,19 @@ class Audit(Base):
     result = Column(String)          # ok, denied, alert
     at = Column(DateTime(timezone=True), server_default=func.now())
 
+class Outbox(Base):
+    __tablename__ = "outbox"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(String, index=True)              # crm.update_customer, ...
+    dedup_key = Column(String, unique=True)        # one delivery per logical side effect
+    session_id = Column(String, index=True)
+    payload = Column(JSON)
+    status = Column(String, index=True, default="pending")  # pending, delivered, dead
+    attempts = Column(Integer, default=0)
+    next_at = Column(DateTime(timezone=True), index=True, server_default=func.now())
+    last_error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    delivered_at = Column(DateTime(timezone=True))
+
 def init_db():
     Base.metadata.create_all(bind=engine)
@@ -0,0 +1,108 @@
+# app/numfmt.py
+"""
+Indian number / currency formatting shared by the letter, KFS and report renderers.
+
+    group_inr(12345678)  -> "1,23,45,678"
+    inr(245000)          -> "₹2,45,000"
+    inr_many([...])      -> list of the same, for tables and batch reports
+
+Grouping is done with integer arithmetic and joins of precomputed 2/3-digit
+strings instead of slicing a string in a loop. Round-thousand amounts up to
+MAX_PRESET (what the widget and policy actually produce) come straight from a
+table built at import.
+
+Run `python -m app.numfmt` for microbenchmarks.
+"""
+from __future__ import annotations
+
+from typing import Any, Iterable, List
+
+RUPEE = "₹"
+MAX_PRESET = 2_000_000  # widget slider max
+
+# Digit-group lookups: "7", "07", "007" for every value a group can hold
+_SMALL = tuple(str(i) for i in range(1000))
+_PAIRS = tuple(f"{i:02d}" for i in range(100))
+_TRIPLES = tuple(f"{i:03d}" for i in range(1000))
+
+def group_inr(v: int) -> str:
+    """Lakh/crore digit grouping of an int: 3 digits, then groups of 2."""
+    if v < 0:
+        return "-" + group_inr(-v)
+    if v < 1000:
+        return _SMALL[v]
+    head, tail = divmod(v, 1000)
+    if head < 100:                      # < 1 lakh
+        return _SMALL[head] + "," + _TRIPLES[tail]
+    if head < 10_000:                   # < 1 crore
+        return ",".join((_SMALL[head // 100], _PAIRS[head % 100], _TRIPLES[tail]))
+    if head < 1_000_000:                # < 100 crore
+        return ",".join((_SMALL[head // 10_000], _PAIRS[head // 100 % 100], _PAIRS[head % 100], _TRIPLES[tail]))
+    parts = [_TRIPLES[tail]]
+    while head >= 100:
+        head, pair = divmod(head, 100)
+        parts.append(_PAIRS[pair])
+    parts.append(_SMALL[head])
+    parts.reverse()
+    return ",".join(parts)
+
+_PRESETS = tuple(group_inr(k * 1000) for k in range(MAX_PRESET // 1000 + 1))
+
+def _to_int(n: Any) -> int:
+    return n if type(n) is int else int(round(float(n)))
+
+def inr(n: Any, symbol: str = RUPEE) -> str:
+    """Format an amount as rupees, rounded to whole rupees. Unparseable input is returned as text."""
+    try:
+        v = _to_int(n)
+    except (TypeError, ValueError, OverflowError):
+        return str(n or "")
+    if 0 <= v <= MAX_PRESET and v % 1000 == 0:
+        return symbol + _PRESETS[v // 1000]
+    return symbol + group_inr(v)
+
+def inr_many(values: Iterable[Any], symbol: str = RUPEE) -> List[str]:
+    """Batch variant of inr() for schedules and reports; avoids per-call global lookups."""
+    presets, group, to_int, top = _PRESETS, group_inr, _to_int, MAX_PRESET
+    out = []
+    append = out.append
+    for n in values:
+        try:
+            v = to_int(n)
+        except (TypeError, ValueError, OverflowError):
+            append(str(n or ""))
+            continue
+        if 0 <= v <= top and v % 1000 == 0:
+            append(symbol + presets[v // 1000])
+        else:
+            append(symbol + group(v))
+    return out
+
+if __name__ == "__main__":
+    import random
+    import timeit
+
+    def _legacy(n: Any) -> str:
+        # the old while-loop grouping from app/pdf/sanction_letter.py
+        s = str(int(round(float(n))))
+        if len(s) <= 3:
+            return RUPEE + s
+        last3, rest, parts = s[-3:], s[:-3], []
+        while len(rest) > 2:
+            parts.append(rest[-2:])
+            rest = rest[:-2]
+        if rest:
+            parts.append(rest)
+        return RUPEE + ",".join(reversed(parts)) + "," + last3
+
+    rnd = random.Random(7)
+    mixed = [rnd.randint(1, 50_000_000) for _ in range(10_000)]
+    round_ = [rnd.randrange(10_000, MAX_PRESET, 1000) for _ in range(10_000)]
+    assert [inr(v) for v in mixed] == [_legacy(v) for v in mixed] == inr_many(mixed)
+
+    for label, data in (("mixed", mixed), ("round thousands", round_)):
+        legacy = timeit.timeit(lambda: [_legacy(v) for v in data], number=20)
+        single = timeit.timeit(lambda: [inr(v) for v in data], number=20)
+        batch = timeit.timeit(lambda: inr_many(data), number=20)
+        per = 1e9 / (20 * len(data))
+        print(f"{label:16s} legacy {legacy * per:6.0f} ns  inr {single * per:6.0f} ns  inr_many {batch * per:6.0f} ns")
@@ -0,0 +1,171 @@
+# app/outbox.py
+"""
+Transactional outbox for side effects that must not block or break the chat.
+
+Rows are added with `add()` inside the same DB transaction that saves the
+session (see events.save_session), so a side effect is recorded if and only
+if the stage change is. A background Dispatcher drains pending rows in
+batches per kind, retries failures with capped exponential backoff, and
+marks rows `dead` after OUTBOX_MAX_ATTEMPTS. dedup_key is unique: enqueuing
+the same logical effect twice is a no-op, and it is sent along as the
+idempotency key so the receiver can dedupe retries too.
+"""
+import logging
+import random
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+
+from app.config import settings
+from app.models import SessionLocal, Outbox
+from app.services import crm
+
+log = logging.getLogger(__name__)
+
+# kind -> batch handler(list of {"session_id", "payload", "idempotency_key"}) -> list of {"ok": bool}
+HANDLERS: Dict[str, Callable[[List[dict]], List[dict]]] = {
+    "crm.update_customer": crm.update_customers,
+}
+
+LEASE = timedelta(seconds=60)  # a claimed row is invisible to other dispatchers for this long
+BACKOFF_BASE = 2.0
+BACKOFF_CAP = 300.0
+
+_UPSERT_DIALECTS = {"sqlite": sqlite_insert, "postgresql": pg_insert}
+
+def add(db, kind: str, session_id: str, payload: dict, dedup_key: str = None) -> bool:
+    """Queue a side effect on an open DB session. Returns False if it was already queued.
+
+    A single INSERT ... ON CONFLICT (dedup_key) DO NOTHING, so two overlapping saves
+    of the same session cannot both pass a check and then trip the unique index."""
+    key = dedup_key or f"{kind}:{session_id}"
+    values = {"kind": kind, "dedup_key": key, "session_id": session_id, "payload": payload}
+    insert_ = _UPSERT_DIALECTS.get(db.get_bind().dialect.name)
+    if insert_ is not None:
+        stmt = insert_(Outbox).values(**values).on_conflict_do_nothing(index_elements=["dedup_key"])
+        return db.execute(stmt).rowcount > 0
+    # other backends: savepoint so a lost race only undoes this row
+    try:
+        with db.begin_nested():
+            db.add(Outbox(**values))
+    except IntegrityError:
+        return False
+    return True
+
+def _backoff(attempts: int) -> timedelta:
+    secs = min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (attempts - 1))
+    return timedelta(seconds=secs * random.uniform(0.5, 1.0))
+
+def dispatch_once(batch_size: int = None) -> dict:
+    """Deliver up to batch_size due rows. Returns counts for this pass."""
+    batch_size = batch_size or settings.outbox_batch
+    now = datetime.utcnow()
+    stats = {"claimed": 0, "delivered": 0, "retried": 0, "dead": 0}
+
+    # claim: push next_at past the lease so a concurrent dispatcher skips these rows.
+    # Each row is taken with a conditional UPDATE; if another dispatcher (another
+    # uvicorn worker) leased it between our SELECT and UPDATE, rowcount is 0 and we skip it.
+    with SessionLocal() as db:
+        rows = db.execute(
+            select(Outbox.id, Outbox.kind, Outbox.session_id, Outbox.payload, Outbox.dedup_key)
+            .where(Outbox.status == "pending", Outbox.next_at <= now)
+            .order_by(Outbox.id)
+            .limit(batch_size)
+        ).all()
+        claimed = []
+        for r in rows:
+            won = db.execute(
+                update(Outbox)
+                .where(Outbox.id == r.id, Outbox.status == "pending", Outbox.next_at <= now)
+                .values(next_at=now + LEASE)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if won:
+                claimed.append(tuple(r))
+        db.commit()
+    stats["claimed"] = len(claimed)
+    if not claimed:
+        return stats
+
+    by_kind: Dict[str, list] = {}
+    for item in claimed:
+        by_kind.setdefault(item[1], []).append(item)
+
+    outcome: Dict[int, str] = {}  # row id -> error ("" on success)
+    for kind, items in by_kind.items():
+        handler = HANDLERS.get(kind)
+        if handler is None:
+            outcome.update({i[0]: f"no handler for {kind}" for i in items})
+            continue
+        try:
+            results = handler([
+                {"session_id": sid, "payload": payload, "idempotency_key": key}
+                for _, _, sid, payload, key in items
+            ])
+            if len(results) != len(items):
+                # cannot tell which items went through: fail the batch, the receiver dedupes retries
+                raise ValueError(f"{kind} handler returned {len(results)} results for {len(items)} items")
+            for (row_id, *_), res in zip(items, results):
+                outcome[row_id] = "" if res.get("ok") else str(res.get("error") or "rejected")
+        except Exception as e:
+            outcome.update({i[0]: f"{type(e).__name__}: {e}" for i in items})
+
+    with SessionLocal() as db:
+        for row_id, err in outcome.items():
+            r = db.get(Outbox, row_id)
+            r.attempts = (r.attempts or 0) + 1
+            if not err:
+                r.status = "delivered"
+                r.delivered_at = datetime.utcnow()
+                r.last_error = None
+                stats["delivered"] += 1
+            elif r.attempts >= settings.outbox_max_attempts:
+                r.status = "dead"
+                r.last_error = err
+                stats["dead"] += 1
+                log.error("outbox %s (%s) dead after %s attempts: %s", r.id, r.kind, r.attempts, err)
+            else:
+                r.next_at = datetime.utcnow() + _backoff(r.attempts)
+                r.last_error = err
+                stats["retried"] += 1
+        db.commit()
+    return stats
+
+def depth() -> dict:
+    """Row counts by status, for /api/metrics."""
+    with SessionLocal() as db:
+        return dict(db.execute(select(Outbox.status, func.count()).group_by(Outbox.status)).all())
+
+class Dispatcher:
+    """Background thread that keeps draining the outbox; loops without sleeping while there is a backlog."""
+
+    def __init__(self, interval: float = None):
+        self.interval = interval if interval is not None else settings.outbox_interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="outbox-dispatcher", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                stats = dispatch_once()
+            except Exception:
+                log.exception("outbox dispatch failed")
+                stats = {"claimed": 0}
+            if stats["claimed"] < settings.outbox_batch:
+                self._stop.wait(self.interval)
@@ -0,0 +1,95 @@
+# app/pdf/render.py
+import logging
+import os
+import tempfile
+import threading
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List
+
+from reportlab.platypus import SimpleDocTemplate
+
+from app.config import settings
+from app.tracing import span
+
+log = logging.getLogger(__name__)
+
+class PdfBudgetExceeded(RuntimeError):
+    pass
+
+# tracemalloc is process-wide: measured builds take turns so each one gets its own
+# peak and nobody's tracemalloc.stop() ends another render's measurement
+_mem_lock = threading.Lock()
+
+def _build(doc, story, callbacks, name: str):
+    with span("pdf.build", file=name, flowables=len(story)):
+        doc.build(story, **callbacks)
+
+def _measured_build(doc, story, callbacks, name: str) -> int:
+    """Build under tracemalloc and return the peak bytes allocated above the starting point.
+    Reuses an already running tracemalloc (e.g. PYTHONTRACEMALLOC) instead of stopping it."""
+    owned = not tracemalloc.is_tracing()
+    if owned:
+        tracemalloc.start()
+    else:
+        tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    try:
+        _build(doc, story, callbacks, name)
+        return tracemalloc.get_traced_memory()[1] - base
+    finally:
+        if owned:
+            tracemalloc.stop()
+
+def render_pdf(path: str, story: List[Any], onFirstPage=None, onLaterPages=None, **doc_kwargs) -> Dict[str, Any]:
+    """
+    Build `story` into a temp file next to `path`, then atomically rename it.
+
+    Page streams are compressed. Readers (StaticFiles, the widget) never see a
+    half-written letter, and a failed or over-budget render leaves no file behind.
+    Returns {"path", "bytes", "peak_mem"}; peak_mem is None unless PDF_TRACK_MEM=1
+    or PDF_MAX_PEAK_MEM is set. Measured builds are serialised, so turn tracking
+    on only where the per-document figure is worth the lost parallelism. Python
+    allocations of other threads during the build still count, so peak_mem is
+    an upper bound.
+    """
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f".{target.name}.", suffix=".tmp", dir=str(target.parent))
+    os.close(fd)
+
+    doc_kwargs.setdefault("pageCompression", 1)
+    doc = SimpleDocTemplate(tmp, **doc_kwargs)
+    callbacks = {}
+    if onFirstPage:
+        callbacks["onFirstPage"] = onFirstPage
+    if onLaterPages:
+        callbacks["onLaterPages"] = onLaterPages
+
+    track = settings.pdf_track_mem or settings.pdf_max_peak_mem > 0
+    peak = None
+    try:
+        if track:
+            with _mem_lock:
+                peak = _measured_build(doc, story, callbacks, target.name)
+        else:
+            _build(doc, story, callbacks, target.name)
+
+        size = os.path.getsize(tmp)
+        if settings.pdf_max_bytes and size > settings.pdf_max_bytes:
+            raise PdfBudgetExceeded(f"{target.name}: {size} bytes > {settings.pdf_max_bytes}")
+        if settings.pdf_max_peak_mem and peak is not None and peak > settings.pdf_max_peak_mem:
+            raise PdfBudgetExceeded(f"{target.name}: peak {peak} bytes > {settings.pdf_max_peak_mem}")
+
+        os.chmod(tmp, 0o644)  # mkstemp creates 0600
+        os.replace(tmp, target)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+    stats = {"path": str(target), "bytes": size, "peak_mem": peak}
+    log.info("pdf rendered %s bytes=%s peak_mem=%s", target.name, size, peak)
+    return stats
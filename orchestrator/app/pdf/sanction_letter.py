@@ -1,6 +1,6 @@
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterable, Optional, Sequence
 
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_LEFT, TA_RIGHT
@@ -8,11 +8,14 @@ from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
 from reportlab.lib.units import mm
 from reportlab.platypus import (
-    SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, HRFlowable
+    Paragraph, Spacer, Table, TableStyle, HRFlowable
 )
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 
+from app.numfmt import inr
+from app.pdf.render import render_pdf
+
 # ---------- Font setup (₹ support) ----------
 def _find_font(fname: str) -> Optional[Path]:
     candidates = [
@@ -44,25 +47,7 @@ def _p(text: Any, style: ParagraphStyle) -> Paragraph:
 
 def _format_inr(n: Any) -> str:
     """Format as Indian currency string. Uses ₹ when Unicode font is available, else 'Rs '."""
-    try:
-        v = int(round(float(n)))
-    except Exception:
-        return str(n or "")
-    s = str(v)
-    if len(s) <= 3:
-        grp = s
-    else:
-        last3 = s[-3:]
-        rest = s[:-3]
-        parts = []
-        while len(rest) > 2:
-            parts.append(rest[-2:])
-            rest = rest[:-2]
-        if rest:
-            parts.append(rest)
-        grp = ",".join(reversed(parts)) + "," + last3
-    prefix = "₹" if USE_DV else "Rs "
-    return f"{prefix}{grp}"
+    return inr(n, "₹" if USE_DV else "Rs ")
 
 # ---------- Styles ----------
 _BASE = getSampleStyleSheet()
@@ -77,20 +62,47 @@ SMALL = ParagraphStyle("SMALL", parent=BODY, fontSize=8, textColor=colors.HexCol
 CELL_L = ParagraphStyle("CELL_L", parent=BODY, alignment=TA_LEFT)
 CELL_R = ParagraphStyle("CELL_R", parent=BODY, alignment=TA_RIGHT)
 
+# Table styles are immutable once built, so share them across letters
+BORROWER_TS = TableStyle([
+    ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+    ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
+])
+SUMMARY_TS = TableStyle([
+    ("GRID", (0, 0), (-1, -1), 0.25, colors.HexColor("#C8CBD0")),
+    ("BACKGROUND", (0, 0), (0, -1), colors.whitesmoke),
+    ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+    ("LEFTPADDING", (0, 0), (-1, -1), 6),
+    ("RIGHTPADDING", (0, 0), (-1, -1), 6),
+    ("BOTTOMPADDING", (0, 0), (-1, -1), 5),
+    ("TOPPADDING", (0, 0), (-1, -1), 5),
+])
+
+SCHEDULE_TS = TableStyle([
+    ("GRID", (0, 0), (-1, -1), 0.25, colors.HexColor("#C8CBD0")),
+    ("BACKGROUND", (0, 0), (-1, 0), colors.whitesmoke),
+    ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+    ("LEFTPADDING", (0, 0), (-1, -1), 4),
+    ("RIGHTPADDING", (0, 0), (-1, -1), 4),
+    ("BOTTOMPADDING", (0, 0), (-1, -1), 2),
+    ("TOPPADDING", (0, 0), (-1, -1), 2),
+])
+
+def _schedule_table(rows: Iterable[Sequence[int]]) -> Table:
+    body = [[_p(h, CELL_L) for h in ("Month", "Instalment", "Principal", "Interest", "Balance")]]
+    for month, *money in rows:
+        body.append([_p(month, CELL_L)] + [_p(_format_inr(v), CELL_R) for v in money])
+    t = Table(body, colWidths=[20*mm, None, None, None, None], repeatRows=1, hAlign="LEFT")
+    t.setStyle(SCHEDULE_TS)
+    return t
+
 # ---------- Main ----------
-def generate_pdf(path: str, kfs: Dict[str, Any]) -> str:
+def generate_pdf(path: str, kfs: Dict[str, Any], schedule: Optional[Iterable[Sequence[int]]] = None) -> str:
     """
     Build a clean, audit-friendly sanction letter.
     kfs keys expected: Name, PAN last 4, Amount, Tenure, EMI, APR, MandateID
+    schedule: optional amortisation rows (see app.quotes.schedule), rendered as
+    a repayment table that continues over as many pages as it needs.
     """
-    Path(path).parent.mkdir(parents=True, exist_ok=True)
-
-    doc = SimpleDocTemplate(
-        path, pagesize=A4,
-        rightMargin=18*mm, leftMargin=18*mm, topMargin=18*mm, bottomMargin=18*mm,
-        title="Sanction Letter", author="GreenLight Credit"
-    )
-
     now = datetime.now()
     ref = f"GLC-{now.strftime('%Y%m%d')}-{kfs.get('MandateID','XXXX')}"
 
@@ -111,10 +123,7 @@ def generate_pdf(path: str, kfs: Dict[str, Any]) -> str:
         ],
         colWidths=[60*mm, None], hAlign="LEFT"
     )
-    borrower_tbl.setStyle(TableStyle([
-        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-        ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
-    ]))
+    borrower_tbl.setStyle(BORROWER_TS)
     story.append(borrower_tbl)
     story.append(Spacer(1, 6))
 
@@ -130,18 +139,15 @@ def generate_pdf(path: str, kfs: Dict[str, Any]) -> str:
         ],
         colWidths=[70*mm, None], hAlign="LEFT"
     )
-    summary_tbl.setStyle(TableStyle([
-        ("GRID", (0, 0), (-1, -1), 0.25, colors.HexColor("#C8CBD0")),
-        ("BACKGROUND", (0, 0), (0, -1), colors.whitesmoke),
-        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-        ("LEFTPADDING", (0, 0), (-1, -1), 6),
-        ("RIGHTPADDING", (0, 0), (-1, -1), 6),
-        ("BOTTOMPADDING", (0, 0), (-1, -1), 5),
-        ("TOPPADDING", (0, 0), (-1, -1), 5),
-    ]))
+    summary_tbl.setStyle(SUMMARY_TS)
     story.append(summary_tbl)
     story.append(Spacer(1, 10))
 
+    if schedule is not None:
+        story.append(_p("Repayment Schedule", H2))
+        story.append(_schedule_table(schedule))
+        story.append(Spacer(1, 10))
+
     # Important Notes
     story.append(_p("Important Notes", H2))
     notes = [
@@ -159,5 +165,9 @@ def generate_pdf(path: str, kfs: Dict[str, Any]) -> str:
     story.append(_p("Digitally issued by GreenLight Credit. This is a system-generated document, no signature required.", SMALL))
     story.append(_p("For any queries, contact support@greenlight.example", SMALL))
 
-    doc.build(story)
+    render_pdf(
+        path, story, pagesize=A4,
+        rightMargin=18*mm, leftMargin=18*mm, topMargin=18*mm, bottomMargin=18*mm,
+        title="Sanction Letter", author="GreenLight Credit"
+    )
     return path
@@ -0,0 +1,105 @@
+# app/quotes.py
+"""
+Precomputed offer quotes for the preset amount/tenure grid.
+
+The grid is the policy's quote_amounts range x tenure_months: about 150 cells.
+Every cell (EMI, total payable, processing fee, GST, net disbursal) is
+materialised once per policy generation (see app/refdata.py) into a read-only
+mapping, so the common widget requests are a dict lookup. Off-grid amounts or
+tenures are computed live with the same math. The EMI formula matches
+underwriting exactly: floor of the standard annuity. Each quote also carries
+its money fields pre-formatted (`fmt`), which the KFS and the letter use
+as they are.
+"""
+import threading
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Tuple
+
+from app import refdata
+from app.numfmt import inr_many
+
+Quote = Dict[str, Any]
+MONEY = ("amount", "emi", "total_payable", "processing_fee", "gst", "net_disbursal")
+
+def _offers(policy: dict) -> dict:
+    return policy.get("offers", {})
+
+def compute(amount: int, tenure: int, policy: dict) -> Quote:
+    offers = _offers(policy)
+    apr = offers["default_apr"]
+    fee_rate = offers.get("processing_fee_rate", 0.015)
+    gst_rate = offers.get("gst_rate", 0.18)
+
+    r = apr / 12 / 100
+    if amount <= 0 or tenure <= 0:
+        emi = 0
+    elif r == 0:
+        emi = int(amount / tenure)
+    else:
+        f = (1 + r) ** tenure
+        emi = int(amount * r * f / (f - 1))
+    fee = int(round(amount * fee_rate))
+    gst = int(round(fee * gst_rate))
+    q = {
+        "amount": amount,
+        "tenure": tenure,
+        "apr": apr,
+        "emi": emi,
+        "total_payable": emi * tenure,
+        "processing_fee": fee,
+        "gst": gst,
+        "net_disbursal": amount - fee - gst,
+    }
+    q["fmt"] = dict(zip(MONEY, inr_many(q[k] for k in MONEY)))
+    return q
+
+def schedule(quote: Mapping[str, Any]) -> List[Tuple[int, int, int, int, int]]:
+    """Amortisation rows (month, emi, principal, interest, closing balance) in whole rupees.
+    The last instalment absorbs rounding so the balance ends at 0."""
+    r = quote["apr"] / 12 / 100
+    emi, months = quote["emi"], quote["tenure"]
+    rows, bal = [], quote["amount"]
+    for m in range(1, months + 1):
+        interest = int(round(bal * r))
+        principal = bal if m == months else min(bal, emi - interest)
+        bal -= principal
+        rows.append((m, principal + interest, principal, interest, bal))
+    return rows
+
+def _materialise(policy: dict) -> Mapping[Tuple[int, int], Quote]:
+    offers = _offers(policy)
+    lo, hi, step = offers.get("quote_amounts", [10000, offers.get("max_amount", 500000), 10000])
+    grid = {}
+    for tenure in offers.get("tenure_months", [12, 24, 36]):
+        for amount in range(lo, hi + 1, step):
+            q = compute(amount, tenure, policy)
+            q["fmt"] = MappingProxyType(q["fmt"])
+            grid[(amount, tenure)] = MappingProxyType(q)
+    return MappingProxyType(grid)
+
+_lock = threading.Lock()
+_built_for: Any = None   # policy object the table was built from
+_table: Mapping[Tuple[int, int], Quote] = MappingProxyType({})
+
+def table() -> Mapping[Tuple[int, int], Quote]:
+    """The preset table for the current policy; rebuilt only when the policy generation changes."""
+    global _built_for, _table
+    policy = refdata.policy()
+    if policy is not _built_for:
+        with _lock:
+            if policy is not _built_for:
+                _table = _materialise(policy)
+                _built_for = policy
+    return _table
+
+def get_quote(amount: int, tenure: int) -> Tuple[Quote, bool]:
+    """(quote, preset). Preset quotes are shared read-only mappings; copy before mutating."""
+    hit = table().get((amount, tenure))
+    if hit is not None:
+        return hit, True
+    return compute(amount, tenure, refdata.policy()), False
+
+def quote_for_apr(amount: int, tenure: int, apr: float) -> Quote:
+    """Live quote at an explicit APR (percent) with the current policy's fee rates."""
+    policy = refdata.policy()
+    return compute(amount, tenure, {**policy, "offers": {**_offers(policy), "default_apr": apr}})
@@ -0,0 +1,127 @@
+# app/refdata.py
+"""
+Immutable reference tables (policy, pre-approved limits) shared by all workers.
+
+Shared mode: a parent step (`python -m app.refdata publish`, run before uvicorn
+starts its workers, or by the nightly batch) writes a generation directory
+
+    REFDATA_DIR/gen-<ns>/policy.json
+    REFDATA_DIR/gen-<ns>/preapproved.idx
+
+and atomically points REFDATA_DIR/CURRENT at it. Workers never parse or build
+anything: they mmap the index read-only, so its pages live once in the page
+cache no matter how many workers there are. Publishing a new generation is the
+refresh; workers notice CURRENT changed within REFDATA_CHECK_SECS and swap.
+
+Local mode (no CURRENT file): policy.yaml is parsed in-process and the
+pre-approved index next to its source is opened if it has been built
+(`python -m app.services.preapproved`); workers never build it themselves.
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import yaml
+
+from app.services import preapproved
+from app.services.preapproved import PreapprovedIndex, build_index, make_key
+
+POLICY_PATH = Path(__file__).resolve().parent / "rules" / "policy.yaml"
+REFDATA_DIR = Path(os.getenv(
+    "REFDATA_DIR",
+    str(Path(__file__).resolve().parents[1] / "data" / "refdata"),
+))
+CHECK_EVERY = float(os.getenv("REFDATA_CHECK_SECS", 5))
+LOCAL = "local"
+
+class Generation:
+    def __init__(self, name: str, policy: Dict[str, Any], index: Optional[PreapprovedIndex]):
+        self.name = name
+        self.policy = policy
+        self.index = index
+
+    def preapproved_limit(self, mobile: str | None, pan_tail: str | None) -> Optional[int]:
+        key = make_key(mobile, pan_tail)
+        if key is None or self.index is None:
+            return None
+        return self.index.get(key)
+
+_lock = threading.Lock()
+_gen: Optional[Generation] = None
+_next_check = 0.0
+
+def _read_current() -> Optional[str]:
+    try:
+        return (REFDATA_DIR / "CURRENT").read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+def _load_shared(name: str) -> Generation:
+    d = REFDATA_DIR / name
+    policy = json.loads((d / "policy.json").read_text(encoding="utf-8"))
+    idx_path = d / "preapproved.idx"
+    index = PreapprovedIndex(idx_path) if idx_path.exists() else None
+    return Generation(name, policy, index)
+
+def _load_local(prev: Optional[Generation]) -> Generation:
+    policy = prev.policy if prev is not None and prev.name == LOCAL else yaml.safe_load(POLICY_PATH.read_text())
+    return Generation(LOCAL, policy, preapproved.refresh())
+
+def current() -> Generation:
+    """The generation this worker should use right now. Cheap: one stat-and-read every CHECK_EVERY seconds."""
+    global _gen, _next_check
+    now = time.monotonic()
+    if _gen is not None and now < _next_check:
+        return _gen
+    with _lock:
+        if _gen is None or now >= _next_check:
+            _next_check = now + CHECK_EVERY
+            try:
+                name = _read_current()
+                if name is None:
+                    _gen = _load_local(_gen)
+                elif _gen is None or _gen.name != name:
+                    _gen = _load_shared(name)
+            except (OSError, ValueError):
+                if _gen is None:
+                    raise
+                # keep serving the previous generation
+    return _gen
+
+def policy() -> Dict[str, Any]:
+    return current().policy
+
+def publish(policy_src: Path = POLICY_PATH, preapproved_src: Path = preapproved.SOURCE_PATH, keep: int = 2) -> str:
+    """Build a new generation and make it current. Run from one process only (the parent, or a cron job)."""
+    name = f"gen-{time.time_ns()}"
+    d = REFDATA_DIR / name
+    d.mkdir(parents=True)
+    (d / "policy.json").write_text(json.dumps(yaml.safe_load(policy_src.read_text())), encoding="utf-8")
+    if preapproved_src.exists():
+        build_index(preapproved_src, d / "preapproved.idx")
+
+    tmp = REFDATA_DIR / f".CURRENT.{os.getpid()}"
+    tmp.write_text(name, encoding="utf-8")
+    tmp.replace(REFDATA_DIR / "CURRENT")
+
+    # Workers that still map an older generation keep their pages after unlink
+    gens = sorted(p for p in REFDATA_DIR.glob("gen-*") if p.is_dir())
+    for old in gens[:-keep]:
+        shutil.rmtree(old, ignore_errors=True)
+    return name
+
+if __name__ == "__main__":
+    # python -m app.refdata publish [policy.yaml] [preapproved.csv|json]
+    import sys
+    args = sys.argv[1:]
+    if not args or args[0] != "publish":
+        sys.exit("usage: python -m app.refdata publish [policy.yaml] [preapproved.csv|json]")
+    pol = Path(args[1]) if len(args) > 1 else POLICY_PATH
+    src = Path(args[2]) if len(args) > 2 else preapproved.SOURCE_PATH
+    print(publish(pol, src))
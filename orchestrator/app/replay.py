@@ -0,0 +1,103 @@
+# app/replay.py
+"""
+Bulk replay: rebuild session state from snapshots + events.
+
+    python -m app.replay                 # verify every session against Session.state
+    python -m app.replay --write         # overwrite Session.state with the rebuilt state
+    python -m app.replay --seed-legacy   # snapshot the current state of pre-event-sourcing sessions
+    python -m app.replay --workers 8 --batch 2000
+
+Session ids are paged by keyset (id > last) so memory stays flat, and each
+page is rebuilt by a worker process with two queries (events.rebuild_many).
+
+Sessions created before event sourcing only have partial events (stage and
+precheck), so their rebuild is not their state. A session counts as event
+sourced if it has a snapshot or its first event is a message; anything else
+is reported as legacy and never overwritten, even with --write.
+--seed-legacy stores Session.state as a snapshot at the session's latest
+event, after which the session replays like any other.
+"""
+import argparse
+import copy
+import time
+from multiprocessing import Pool
+from typing import Iterator, List, Set, Tuple
+
+from sqlalchemy import func, select
+
+from app.models import SessionLocal, Session, Event, Snapshot, engine
+from app.events import rebuild_many
+
+def _pages(batch: int) -> Iterator[List[str]]:
+    last = ""
+    while True:
+        with SessionLocal() as db:
+            ids = db.execute(
+                select(Session.id).where(Session.id > last).order_by(Session.id).limit(batch)
+            ).scalars().all()
+        if not ids:
+            return
+        yield ids
+        last = ids[-1]
+
+def _init_worker():
+    # never share the parent's pooled connections across a fork
+    engine.dispose(close=False)
+
+def _sourced(db, ids: List[str]) -> Set[str]:
+    """Sessions whose events fully describe them: a snapshot exists, or the first event is a message."""
+    snapped = set(db.execute(select(Snapshot.session_id).where(Snapshot.session_id.in_(ids)).distinct()).scalars())
+    first = (
+        select(func.min(Event.id).label("id")).where(Event.session_id.in_(ids)).group_by(Event.session_id).subquery()
+    )
+    opened = set(db.execute(
+        select(Event.session_id).join(first, Event.id == first.c.id).where(Event.type == "message")
+    ).scalars())
+    return snapped | opened
+
+def _replay(args: Tuple[List[str], bool, bool]) -> Tuple[int, int, int]:
+    ids, write, seed = args
+    rebuilt = rebuild_many(ids)
+    mismatched = legacy = 0
+    with SessionLocal() as db:
+        sourced = _sourced(db, ids)
+        last_event = dict(db.execute(
+            select(Event.session_id, func.max(Event.id)).where(Event.session_id.in_(ids)).group_by(Event.session_id)
+        ).all()) if seed else {}
+        for s in db.execute(select(Session).where(Session.id.in_(ids))).scalars():
+            if s.id not in sourced:
+                legacy += 1
+                if seed:
+                    db.add(Snapshot(session_id=s.id, event_id=last_event.get(s.id, 0), state=copy.deepcopy(s.state)))
+                continue
+            if s.state != rebuilt[s.id]:
+                mismatched += 1
+                if write:
+                    s.state = rebuilt[s.id]
+        if write or seed:
+            db.commit()
+    return len(ids), mismatched, legacy
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--batch", type=int, default=1000)
+    ap.add_argument("--write", action="store_true", help="store rebuilt state in Session.state (event-sourced sessions only)")
+    ap.add_argument("--seed-legacy", action="store_true", help="snapshot Session.state of pre-event-sourcing sessions")
+    opts = ap.parse_args()
+
+    started = time.monotonic()
+    total = mismatched = legacy = 0
+    with Pool(opts.workers, initializer=_init_worker) as pool:
+        jobs = ((ids, opts.write, opts.seed_legacy) for ids in _pages(opts.batch))
+        for n, bad, old in pool.imap_unordered(_replay, jobs):
+            total += n
+            mismatched += bad
+            legacy += old
+    secs = time.monotonic() - started
+    print(f"replayed {total} sessions in {secs:.1f}s ({total / max(secs, 1e-9):.0f}/s), {mismatched} differ"
+          + (" (rewritten)" if opts.write else "")
+          + f", {legacy} legacy" + (" (seeded)" if opts.seed_legacy else " (skipped)"))
+
+if __name__ == "__main__":
+    main()
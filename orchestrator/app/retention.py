@@ -0,0 +1,245 @@
+# app/retention.py
+"""
+Retention GC: abandoned sessions, expired documents, DB compaction.
+
+Each run is bounded so it can never stall the app:
+- at most GC_MAX_SESSIONS sessions still in `start`/`precheck` after
+  SESSION_ABANDON_HOURS are deleted, together with their events and snapshots
+- at most GC_MAX_FILES document files are examined: up to half on legacy
+  flat files in the DATA_DIR root, the rest on the 256x256 shard space (see
+  app/storage.py). Each has its own cursor and resumes where the last run
+  stopped, so kept files in one can never starve the other
+- SQLite frees at most GC_VACUUM_PAGES pages via incremental_vacuum
+
+Document expiry is off unless DOC_RETENTION_DAYS > 0. Documents older than
+that are moved under DOC_ARCHIVE_DIR (same relative path) or deleted when it
+is empty. Documents of sessions in `done` are referenced from their state
+(sanction.pdf) and are kept unless DOC_EXPIRE_DONE=1. Metrics of the last
+run are kept for /api/metrics.
+
+incremental_vacuum needs auto_vacuum=INCREMENTAL, which an existing SQLite
+file only gets through a full VACUUM. That rewrite is a one-off migration,
+never done by the GC:
+
+    python -m app.retention enable-incremental-vacuum
+"""
+import heapq
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from sqlalchemy import delete, select, text
+
+from app.config import settings
+from app.models import SessionLocal, Session, Event, Snapshot, engine
+from app.storage import DATA_DIR, DOCS, LEGACY_PREFIXES
+
+log = logging.getLogger(__name__)
+
+ABANDONED_STAGES = ("start", "precheck")
+SHARDS = 256 * 256
+
+_cursor = 0  # next shard index to scan
+_flat_cursor = ""  # last legacy flat file name examined
+_last: dict = {}
+
+def _shard_dir(i: int) -> Path:
+    return DATA_DIR / DOCS / f"{i >> 8:02x}" / f"{i & 0xff:02x}"
+
+def _flat_files(budget: int) -> List[os.DirEntry]:
+    """Next `budget` legacy flat files in the DATA_DIR root by name, after _flat_cursor (wrapping)."""
+    global _flat_cursor
+    if budget <= 0:
+        return []
+    with os.scandir(DATA_DIR) as it:
+        entries = [e for e in it if e.name.startswith(LEGACY_PREFIXES) and e.name > _flat_cursor and e.is_file()]
+    batch = heapq.nsmallest(budget, entries, key=lambda e: e.name)
+    # a short batch means the end was reached: start from the first name next run
+    _flat_cursor = batch[-1].name if len(batch) == budget else ""
+    return batch
+
+def _shard_files(budget: int) -> Iterator[os.DirEntry]:
+    """Yield about `budget` entries from whole shards, starting at the cursor."""
+    global _cursor
+    seen = visited = 0
+    while visited < SHARDS and seen < budget:
+        if _cursor & 0xff == 0 and not _shard_dir(_cursor).parent.is_dir():
+            # whole first-level group missing: skip its 256 shards at once
+            _cursor = (_cursor + 256) % SHARDS
+            visited += 256
+            continue
+        d = _shard_dir(_cursor)
+        _cursor = (_cursor + 1) % SHARDS
+        visited += 1
+        if not d.is_dir():
+            continue
+        with os.scandir(d) as it:
+            for e in it:
+                if e.is_file():
+                    yield e
+                    seen += 1
+
+def _candidate_files(budget: int) -> Iterator[os.DirEntry]:
+    """Up to half the budget on legacy flat files, the rest (at least half) on shards.
+    Each scan resumes from its own cursor, so files kept by one never stall the other."""
+    flat = _flat_files(budget // 2)
+    yield from flat
+    yield from _shard_files(budget - len(flat))
+
+def _expire_sessions(now: datetime, stats: dict):
+    cutoff = now - timedelta(hours=settings.session_abandon_hours)
+    with SessionLocal() as db:
+        ids = db.execute(
+            select(Session.id)
+            .where(Session.created_at < cutoff,
+                   Session.state["stage"].as_string().in_(ABANDONED_STAGES))
+            .order_by(Session.created_at)
+            .limit(settings.gc_max_sessions)
+        ).scalars().all()
+        if ids:
+            stats["events_deleted"] = db.execute(delete(Event).where(Event.session_id.in_(ids))).rowcount
+            db.execute(delete(Snapshot).where(Snapshot.session_id.in_(ids)))
+            db.execute(delete(Session).where(Session.id.in_(ids)))
+            db.commit()
+        stats["sessions_expired"] = len(ids)
+
+def _session_of(name: str) -> Optional[str]:
+    prefix, _, rest = name.partition("_")
+    return rest.rsplit(".", 1)[0] if prefix and rest else None
+
+def _done_sessions(ids: set) -> set:
+    ids, done = list(ids), set()
+    with SessionLocal() as db:
+        for i in range(0, len(ids), 500):  # stay under SQLite's bound-parameter limit
+            done.update(db.execute(
+                select(Session.id).where(Session.id.in_(ids[i:i + 500]),
+                                         Session.state["stage"].as_string() == "done")
+            ).scalars())
+    return done
+
+def _expire_documents(now: float, stats: dict):
+    if settings.doc_retention_days <= 0:
+        return
+    cutoff = now - settings.doc_retention_days * 86400
+    archive = Path(settings.doc_archive_dir) if settings.doc_archive_dir else None
+    expired = []
+    for e in _candidate_files(settings.gc_max_files):
+        stats["files_scanned"] += 1
+        try:
+            if e.stat().st_mtime < cutoff:
+                expired.append(e)
+        except FileNotFoundError:
+            continue
+    keep = set() if settings.doc_expire_done else _done_sessions({_session_of(e.name) for e in expired} - {None})
+    for e in expired:
+        if _session_of(e.name) in keep:
+            stats["files_kept"] += 1
+            continue
+        try:
+            if archive is not None:
+                dst = archive / Path(e.path).relative_to(DATA_DIR)
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                shutil.move(e.path, dst)
+                stats["files_archived"] += 1
+            else:
+                os.unlink(e.path)
+                stats["files_deleted"] += 1
+        except FileNotFoundError:
+            continue
+
+def _compact(stats: dict):
+    if engine.dialect.name != "sqlite":
+        return  # server databases vacuum themselves
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        if cur.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            stats["vacuum"] = "off (run: python -m app.retention enable-incremental-vacuum)"
+            return
+        before = cur.execute("PRAGMA freelist_count").fetchone()[0]
+        # sqlite3 runs a single step of the pragma per execute(), i.e. frees one
+        # page, so step it once per page inside one transaction
+        cur.execute("BEGIN")
+        for _ in range(min(before, max(0, settings.gc_vacuum_pages))):
+            cur.execute("PRAGMA incremental_vacuum(1)")
+        cur.close()  # finalise the last pragma statement, or COMMIT fails
+        raw.commit()
+        cur = raw.cursor()
+        stats["pages_freed"] = before - cur.execute("PRAGMA freelist_count").fetchone()[0]
+    finally:
+        raw.close()
+
+def enable_incremental_vacuum():
+    """One-off: switch an existing SQLite DB to auto_vacuum=INCREMENTAL (full VACUUM, exclusive lock)."""
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if conn.execute(text("PRAGMA auto_vacuum")).scalar() == 2:
+            print("auto_vacuum already INCREMENTAL")
+            return
+        conn.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+        conn.execute(text("VACUUM"))
+        print("auto_vacuum = INCREMENTAL")
+
+def run_once() -> dict:
+    started = time.monotonic()
+    stats = {
+        "sessions_expired": 0, "events_deleted": 0,
+        "files_scanned": 0, "files_deleted": 0, "files_archived": 0, "files_kept": 0,
+        "pages_freed": 0, "shard_cursor": 0,
+    }
+    _expire_sessions(datetime.utcnow(), stats)
+    _expire_documents(time.time(), stats)
+    _compact(stats)
+    stats["shard_cursor"] = _cursor
+    stats["flat_cursor"] = _flat_cursor
+    stats["duration_ms"] = int((time.monotonic() - started) * 1000)
+    stats["at"] = datetime.utcnow().isoformat(timespec="seconds")
+    _last.clear()
+    _last.update(stats)
+    log.info("retention gc %s", stats)
+    return stats
+
+def last() -> dict:
+    return dict(_last)
+
+class Collector:
+    """Background thread running run_once every GC_INTERVAL_SECS."""
+
+    def __init__(self, interval: Optional[float] = None):
+        self.interval = interval if interval is not None else settings.gc_interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._loop, name="retention-gc", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                run_once()
+            except Exception:
+                log.exception("retention gc failed")
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] == ["enable-incremental-vacuum"]:
+        enable_incremental_vacuum()
+    elif sys.argv[1:] in ([], ["run"]):
+        print(run_once())
+    else:
+        sys.exit("usage: python -m app.retention [run | enable-incremental-vacuum]")
@@ -3,9 +3,10 @@ from typing import Optional, Union, Dict, Any
 from fastapi import APIRouter, Form, Request
 from pydantic import BaseModel
 from pathlib import Path
-import json
 
 from app.agents.master import handle_message
+from app.jsonio import FastJSONResponse, loads
+from app.admission import check_session
 
 router = APIRouter()
 
@@ -39,6 +40,9 @@ def chat(
     salary: Optional[int] = Form(None),
     consent: Optional[str] = Form(None),   # "yes" from widget boot
 ):
+    # per-session rate limit (per-IP and in-flight caps run in middleware)
+    check_session(session_id)
+
     # normalize inputs
     pan_tail = pan_tail or pan_last4  # support either key
     form = {
@@ -84,8 +88,8 @@ def chat(
             disk = str(Path(DATA_DIR) / json_path)
 
         try:
-            with open(disk, "r", encoding="utf-8") as f:
-                kfs_obj = json.load(f)
+            with open(disk, "rb") as f:
+                kfs_obj = loads(f.read())
         except Exception:
             # do not fail the request. Just skip parsing.
             kfs_obj = None
@@ -97,11 +101,12 @@ def chat(
         # if kfs_url and kfs_url.startswith("/"):
         #     kfs_url = base + kfs_url
 
-    out = ChatOut(
-        reply=raw.get("reply"),
-        pdf=pdf,
-        kfs=kfs_obj,
-        kfs_url=kfs_url,
-        handoff=raw.get("handoff"),
-    )
-    return out
+    # same shape as ChatOut (kept as response_model for the schema), rendered
+    # directly to skip a second pydantic validation/serialisation pass
+    return FastJSONResponse({
+        "reply": raw.get("reply"),
+        "pdf": pdf,
+        "kfs": kfs_obj,
+        "kfs_url": kfs_url,
+        "handoff": raw.get("handoff"),
+    })
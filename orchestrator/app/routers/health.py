@@ -1,6 +1,19 @@
 from fastapi import APIRouter
+
+from app import refdata, admission, outbox, retention
+from app.services import resilience
+
 router = APIRouter()
 
 @router.get("/health")
 def health():
-    return {"ok": True}
+    return {"ok": True, "refdata": refdata.current().name}
+
+@router.get("/metrics")
+def metrics():
+    return {
+        "admission": admission.snapshot(),
+        "outbox": outbox.depth(),
+        "adapters": resilience.snapshot(),
+        "retention": retention.last(),
+    }
@@ -0,0 +1,17 @@
+# app/routers/quote.py
+from fastapi import APIRouter, HTTPException, Query
+
+from app.quotes import get_quote
+
+router = APIRouter()
+
+@router.get("/quote")
+def quote(
+    amount: int = Query(150000, ge=1000, le=10_000_000),
+    tenure: int = Query(24, ge=1, le=120),
+):
+    """Instant offer preview for the widget; not a sanction and no eligibility checks."""
+    q, preset = get_quote(amount, tenure)
+    if not q["emi"]:
+        raise HTTPException(status_code=422, detail="No quote for these terms")
+    return {**q, "preset": preset}
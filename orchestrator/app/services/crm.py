@@ -1,2 +1,33 @@
+import json
+import urllib.request
+
+from app.config import settings
+
 def update_customer(session_id: str, payload: dict) -> dict:
     return {"ok": True, "session_id": session_id}
+
+def update_customers(updates: list[dict]) -> list[dict]:
+    """
+    Batch update. Each item is {"session_id", "payload", "idempotency_key"}.
+    Returns one {"ok": bool, ...} per item, in order. With CRM_URL set the batch
+    is POSTed to {CRM_URL}/customers/batch; otherwise the demo mock answers.
+    """
+    if not settings.crm_url:
+        return [update_customer(u["session_id"], u["payload"]) for u in updates]
+
+    req = urllib.request.Request(
+        settings.crm_url.rstrip("/") + "/customers/batch",
+        data=json.dumps({"updates": updates}).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    with urllib.request.urlopen(req, timeout=settings.crm_timeout) as resp:
+        body = json.loads(resp.read() or b"{}")
+    results = body.get("results")
+    if results is None:
+        # 2xx without per-item results: the whole batch was accepted
+        return [{"ok": True, "session_id": u["session_id"]} for u in updates]
+    if not isinstance(results, list) or len(results) != len(updates):
+        raise ValueError(f"CRM returned {len(results) if isinstance(results, list) else type(results).__name__} "
+                         f"results for {len(updates)} updates")
+    return results
@@ -0,0 +1,159 @@
+# app/services/preapproved.py
+"""
+Pre-approved limit store.
+
+The nightly batch lands as a JSON list (see data/customers.json) or a CSV with
+a `mobile,pan_tail,preapproved` header. `build_index` turns it into a compact
+binary file:
+
+    16-byte header | n sorted uint64 keys | n uint32 limits
+
+where key = int(mobile) * 10000 + int(pan_tail). The file is mmap'd read-only
+and searched with bisect directly over the mapped keys, so lookups never touch
+the DB or the network and resident memory does not grow with the batch size.
+Callers go through app.refdata, which decides which index file is current.
+
+Building parses the whole source, so it only ever runs out of band:
+`python -m app.services.preapproved [source]` or `python -m app.refdata
+publish`. The request path (refresh) only opens or reopens a built index.
+"""
+from __future__ import annotations
+
+import csv
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+MAGIC = b"GLPA"
+VERSION = 1
+_HEADER = struct.Struct("<4sIQ")  # magic, version, count
+
+SOURCE_PATH = Path(os.getenv(
+    "PREAPPROVED_PATH",
+    str(Path(__file__).resolve().parents[2] / "data" / "customers.json"),
+))
+
+def make_key(mobile: str | None, pan_tail: str | None) -> Optional[int]:
+    m = str(mobile or "")
+    p = str(pan_tail or "")[-4:]
+    if len(m) != 10 or not m.isdigit() or len(p) != 4 or not p.isdigit():
+        return None
+    return int(m) * 10000 + int(p)
+
+def _read_source(src: Path) -> Iterator[Tuple[int, int]]:
+    if src.suffix == ".json":
+        yield from _parse_rows(json.loads(src.read_text(encoding="utf-8") or "[]"))
+    else:
+        with src.open(newline="", encoding="utf-8") as f:
+            yield from _parse_rows(csv.DictReader(f))
+
+def _parse_rows(rows) -> Iterator[Tuple[int, int]]:
+    for row in rows:
+        key = make_key(row.get("mobile"), row.get("pan_tail"))
+        if key is None:
+            continue
+        try:
+            yield key, int(row.get("preapproved") or 0)
+        except (TypeError, ValueError):
+            continue
+
+def build_index(src: Path, dst: Path) -> int:
+    """Build a sorted index file from `src`. Written to a temp file and renamed, so readers never see it half-done."""
+    latest = {}
+    for key, limit in _read_source(src):
+        latest[key] = limit  # later rows win
+    keys = array("Q", sorted(latest))
+    limits = array("I", (latest[k] for k in keys))
+
+    tmp = dst.with_name(f".{dst.name}.{os.getpid()}.tmp")
+    with tmp.open("wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(keys)))
+        keys.tofile(f)
+        limits.tofile(f)
+    tmp.replace(dst)
+    return len(keys)
+
+class PreapprovedIndex:
+    """Read-only view over an index file. Lookups are O(log n) over the mapping."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        with path.open("rb") as f:
+            st = os.fstat(f.fileno())
+            self._ino, size = st.st_ino, st.st_size
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        if self._mm is None:
+            self.count = 0
+            return
+        magic, version, count = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path}: not a pre-approved index")
+        self.count = count
+        view = memoryview(self._mm)
+        k0 = _HEADER.size
+        v0 = k0 + 8 * count
+        self._keys = view[k0:v0].cast("Q")
+        self._limits = view[v0:v0 + 4 * count].cast("I")
+
+    def get(self, key: int) -> Optional[int]:
+        if not self.count:
+            return None
+        i = bisect_left(self._keys, key)
+        if i < self.count and self._keys[i] == key:
+            return self._limits[i]
+        return None
+
+    def __len__(self) -> int:
+        return self.count
+
+log = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_index: Optional[PreapprovedIndex] = None
+_warned_stale: Optional[float] = None  # source mtime we already warned about
+
+def index_path(src: Path = SOURCE_PATH) -> Path:
+    return src.with_name(src.name + ".idx")
+
+def refresh(src: Path = SOURCE_PATH) -> Optional[PreapprovedIndex]:
+    """Swap in the built index for `src` if it was replaced; never builds. In-flight lookups keep the old mapping."""
+    global _index, _warned_stale
+    with _lock:
+        dst = index_path(src)
+        try:
+            idx_mtime = dst.stat().st_mtime
+        except FileNotFoundError:
+            if src.exists() and _warned_stale != -1:
+                _warned_stale = -1
+                log.warning("no pre-approved index for %s; run: python -m app.services.preapproved %s", src, src)
+            _index = None
+            return None
+        try:
+            src_mtime = src.stat().st_mtime
+        except FileNotFoundError:
+            src_mtime = None
+        if src_mtime is not None and src_mtime > idx_mtime and _warned_stale != src_mtime:
+            _warned_stale = src_mtime
+            log.warning("pre-approved index %s is older than its source; serving it until rebuilt", dst)
+        if _index is None or _index.path != dst or _stale(_index):
+            _index = PreapprovedIndex(dst)
+        return _index
+
+def _stale(idx: PreapprovedIndex) -> bool:
+    try:
+        return os.stat(idx.path).st_ino != idx._ino
+    except OSError:
+        return True
+
+if __name__ == "__main__":
+    # nightly batch: python -m app.services.preapproved /app/data/preapproved.csv
+    import sys
+    src = Path(sys.argv[1]) if len(sys.argv) > 1 else SOURCE_PATH
+    print(f"{build_index(src, index_path(src))} keys -> {index_path(src)}")
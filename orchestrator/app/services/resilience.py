@@ -0,0 +1,196 @@
+# app/services/resilience.py
+"""
+Timeouts, deadlines, circuit breakers and hedging for the service adapters.
+
+    with deadline(8.0):                 # whole /api/chat pipeline
+        with stage("underwrite"):       # this stage's share of the budget
+            call("bureau", bureau.pull_score, pan)
+
+`call` runs the adapter on a bounded thread pool and waits at most
+min(adapter timeout, time left in the stage). Idempotent reads may set
+`hedge_after`: if the first attempt has not answered by then, a duplicate is
+fired and whichever returns first wins. Each adapter has a circuit breaker;
+while it is open, calls fail immediately. Every failure surfaces as
+ServiceUnavailable, which the agents turn into a manual_review handoff.
+
+SERVICE_FAULTS injects faults for local testing, e.g.
+    SERVICE_FAULTS="bureau:delay=3;ckyc:error=0.5"
+delays every bureau call by 3s and fails half the CKYC calls.
+"""
+from __future__ import annotations
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from typing import Any, Callable, Dict, Optional
+
+from app.config import settings
+from app.tracing import span
+
+class ServiceUnavailable(Exception):
+    def __init__(self, service: str, reason: str):
+        super().__init__(f"{service}: {reason}")
+        self.service = service
+        self.reason = reason
+
+# per-adapter knobs; hedge_after=None for calls with side effects
+ADAPTERS: Dict[str, Dict[str, Any]] = {
+    "bureau":  {"timeout": 1.5, "hedge_after": 0.4},
+    "ckyc":    {"timeout": 1.5, "hedge_after": 0.4},
+    "aa":      {"timeout": 2.0, "hedge_after": 0.6},
+    "mandate": {"timeout": 2.5, "hedge_after": None},
+}
+
+# share of the request budget each pipeline stage may spend
+STAGE_SHARES = {"verify": 0.3, "underwrite": 0.3, "sanction": 0.4}
+
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+@contextmanager
+def deadline(seconds: float):
+    """Set the overall deadline for everything under this block (nested deadlines can only shrink it)."""
+    end = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(end if outer is None else min(outer, end))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+@contextmanager
+def stage(name: str):
+    """Cap a pipeline stage at its STAGE_SHARES fraction of the request budget."""
+    with deadline(settings.request_budget * STAGE_SHARES.get(name, 1.0)):
+        yield
+
+def remaining() -> Optional[float]:
+    end = _deadline.get()
+    return None if end is None else max(0.0, end - time.monotonic())
+
+class CircuitBreaker:
+    """closed -> open after `threshold` consecutive failures; one trial call after `reset_after` (half-open)."""
+
+    def __init__(self, name: str, threshold: int, reset_after: float):
+        self.name = name
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = 0.0
+        self.state = "closed"
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_after:
+                self.state = "half_open"
+                return True
+            return False
+
+    def record(self, ok: bool):
+        with self._lock:
+            if ok:
+                self.failures = 0
+                self.state = "closed"
+                return
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+_breakers: Dict[str, CircuitBreaker] = {
+    name: CircuitBreaker(name, settings.breaker_threshold, settings.breaker_reset_secs) for name in ADAPTERS
+}
+_pool = ThreadPoolExecutor(max_workers=settings.adapter_pool_size, thread_name_prefix="adapter")
+_stats_lock = threading.Lock()
+_stats: Dict[str, Dict[str, int]] = {name: {"ok": 0, "timeout": 0, "error": 0, "short_circuit": 0, "hedged": 0} for name in ADAPTERS}
+
+def _bump(name: str, key: str):
+    with _stats_lock:
+        _stats[name][key] += 1
+
+def _parse_faults(raw: str) -> Dict[str, Dict[str, float]]:
+    faults: Dict[str, Dict[str, float]] = {}
+    for part in filter(None, (p.strip() for p in raw.split(";"))):
+        name, _, spec = part.partition(":")
+        opts = dict(kv.split("=", 1) for kv in spec.split(",") if "=" in kv)
+        faults[name.strip()] = {k.strip(): float(v) for k, v in opts.items()}
+    return faults
+
+FAULTS = _parse_faults(os.getenv("SERVICE_FAULTS", ""))
+
+def _invoke(name: str, fn: Callable, args, kwargs):
+    fault = FAULTS.get(name)
+    if fault:
+        if fault.get("delay"):
+            time.sleep(fault["delay"])
+        if random.random() < fault.get("error", 0):
+            raise ConnectionError(f"injected fault in {name}")
+    return fn(*args, **kwargs)
+
+def _submit(name: str, fn: Callable, args, kwargs):
+    # run in a copy of the caller's context so the attempt's span joins the request trace
+    ctx = copy_context()
+    return _pool.submit(ctx.run, _traced_invoke, name, fn, args, kwargs)
+
+def _traced_invoke(name: str, fn: Callable, args, kwargs):
+    with span(f"service.{name}"):
+        return _invoke(name, fn, args, kwargs)
+
+def call(name: str, fn: Callable, *args, **kwargs) -> Any:
+    """Call adapter `name` under its timeout, breaker and hedging policy. Raises ServiceUnavailable."""
+    cfg = ADAPTERS[name]
+    breaker = _breakers[name]
+    if not breaker.allow():
+        _bump(name, "short_circuit")
+        raise ServiceUnavailable(name, "circuit open")
+
+    timeout = cfg["timeout"]
+    left = remaining()
+    if left is not None:
+        timeout = min(timeout, left)
+    if timeout <= 0:
+        _bump(name, "timeout")
+        raise ServiceUnavailable(name, "deadline exceeded")
+
+    start = time.monotonic()
+    futures = {_submit(name, fn, args, kwargs)}
+    hedge_after = cfg.get("hedge_after")
+    if hedge_after is not None and hedge_after < timeout:
+        done, _ = wait(futures, timeout=hedge_after)
+        if not done:
+            _bump(name, "hedged")
+            futures.add(_submit(name, fn, args, kwargs))
+
+    last_error: Optional[BaseException] = None
+    while futures:
+        left = timeout - (time.monotonic() - start)
+        if left <= 0:
+            break
+        done, futures = wait(futures, timeout=left, return_when=FIRST_COMPLETED)
+        for f in done:
+            if f.exception() is None:
+                breaker.record(True)
+                _bump(name, "ok")
+                return f.result()
+            last_error = f.exception()
+
+    # abandoned attempts finish in the background; their results are dropped
+    breaker.record(False)
+    if last_error is not None and not futures:
+        _bump(name, "error")
+        raise ServiceUnavailable(name, f"{type(last_error).__name__}: {last_error}")
+    _bump(name, "timeout")
+    raise ServiceUnavailable(name, f"timed out after {timeout:.2f}s")
+
+def snapshot() -> dict:
+    with _stats_lock:
+        stats = {k: dict(v) for k, v in _stats.items()}
+    for name, b in _breakers.items():
+        stats[name]["breaker"] = b.state
+    return stats
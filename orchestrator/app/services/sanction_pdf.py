@@ -4,36 +4,22 @@ from __future__ import annotations
 from datetime import datetime, timedelta
 from pathlib import Path
 import json
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, Optional, Tuple
 
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import (
-    SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, HRFlowable
+    Paragraph, Spacer, Table, TableStyle, HRFlowable
 )
 from reportlab.pdfgen.canvas import Canvas
 from reportlab.graphics.barcode import qr
 
-DATA_DIR = Path("/app/data")  # mounted in docker-compose
-DATA_DIR.mkdir(parents=True, exist_ok=True)
-
-def inr(n: float | int) -> str:
-    # lightweight Indian formatting for demo
-    s = f"{int(round(n)):,}"
-    # convert 12,34,56,789 style (optional). Keep simple for now.
-    return f"₹{s.replace(',', ',')}"
-
-def compute_emi(p: float, apr: float, months: int) -> Tuple[int, int]:
-    # apr is annual, e.g. 0.18 for 18%
-    r = apr / 12.0
-    if p <= 0 or months <= 0:
-        return 0, 0
-    f = (1 + r) ** months
-    emi = int(round((p * r * f) / (f - 1)))
-    total = emi * months
-    return emi, total
+from app.numfmt import inr
+from app.pdf.render import render_pdf
+from app.quotes import get_quote, quote_for_apr
+from app.storage import DATA_DIR, doc_path, served_url
 
 def _header_footer(canvas: Canvas, doc):
     # Header ribbon
@@ -75,18 +61,55 @@ def _chip(text: str) -> Table:
     ]))
     return t
 
+# Built once per process; every letter shares the same stylesheet
+styles = getSampleStyleSheet()
+styles.add(ParagraphStyle(
+    name="H1",
+    parent=styles["Heading1"],
+    fontName="Helvetica-Bold",
+    fontSize=18,
+    leading=22,
+    textColor=colors.black,
+    spaceAfter=8,
+))
+styles.add(ParagraphStyle(
+    name="Sub",
+    parent=styles["Normal"],
+    fontSize=9.5,
+    textColor=colors.grey,
+))
+styles.add(ParagraphStyle(
+    name="Kpi",
+    parent=styles["Normal"],
+    fontName="Helvetica-Bold",
+    fontSize=12,
+    textColor=colors.Color(0.25, 0.93, 0.62),
+))
+styles.add(ParagraphStyle(
+    name="SecHead",
+    parent=styles["Heading2"],
+    fontName="Helvetica-Bold",
+    fontSize=12,
+    textColor=colors.black,
+    spaceBefore=10, spaceAfter=6,
+))
+
 def build_sanction_pdf(
     session_id: str,
     payload: Dict[str, Any],
     out_dir: Path = DATA_DIR,
-    apr: float = 0.18,
+    apr: Optional[float] = None,
 ) -> Tuple[str, Dict[str, Any]]:
     """
     Builds a polished sanction letter and writes a KFS JSON alongside.
 
+    EMI, totals, fee and GST come from app.quotes, so the letter matches the
+    /api/quote preview and underwriting under the current policy. `apr`
+    (annual fraction, e.g. 0.18) overrides the policy rate.
+
     Returns:
         (served_pdf_path, kfs_dict)
-        served_pdf_path looks like "/files/sanction_<session>.pdf"
+        served_pdf_path looks like "/files/docs/ab/cd/sanction_<session>.pdf"
     """
     name = payload.get("name") or "Applicant"
     amount = int(payload.get("desired_amount") or 0)
@@ -95,12 +118,12 @@ def build_sanction_pdf(
     app_id = payload.get("application_id") or f"APP-{session_id[:6].upper()}"
     mandate_id = payload.get("mandate_id") or f"MDT-{session_id[:6]}"
 
-    emi, total = compute_emi(amount, apr, months)
-    proc_fee_rate = 0.015  # demo numbers
-    gst_rate = 0.18
-    processing_fee = int(round(amount * proc_fee_rate))
-    gst = int(round(processing_fee * gst_rate))
-    disbursal = amount - processing_fee - gst
+    if apr is None:
+        q, _ = get_quote(amount, months)
+    else:
+        q = quote_for_apr(amount, months, apr * 100)
+    apr = q["apr"] / 100
+    money = q["fmt"]
 
     valid_until = (datetime.utcnow() + timedelta(days=7)).strftime("%d %b %Y")
 
@@ -108,64 +131,27 @@ def build_sanction_pdf(
     kfs = {
         "Application ID": app_id,
         "Customer name": name,
-        "Sanction amount": inr(amount),
+        "Sanction amount": money["amount"],
         "Tenure (months)": months,
         "APR (p.a.)": f"{round(apr*100, 2)}%",
-        "EMI": inr(emi),
-        "Total payable": inr(total),
-        "Processing fee": inr(processing_fee),
-        "GST on PF": inr(gst),
-        "Net disbursal": inr(disbursal),
+        "EMI": money["emi"],
+        "Total payable": money["total_payable"],
+        "Processing fee": money["processing_fee"],
+        "GST on PF": money["gst"],
+        "Net disbursal": money["net_disbursal"],
         "Mandate ID": mandate_id,
         "Offer valid until": valid_until,
     }
 
     # File paths
-    pdf_path = out_dir / f"sanction_{session_id}.pdf"
-    kfs_path = out_dir / f"kfs_{session_id}.json"
+    pdf_path = doc_path("sanction", session_id, "pdf", root=out_dir)
+    kfs_path = doc_path("kfs", session_id, "json", root=out_dir)
 
-    with open(kfs_path, "w", encoding="utf-8") as f:
+    tmp = kfs_path.with_suffix(".json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
         json.dump(kfs, f, ensure_ascii=False, indent=2)
+    tmp.replace(kfs_path)
 
-    # Build PDF
-    doc = SimpleDocTemplate(
-        str(pdf_path),
-        pagesize=A4,
-        leftMargin=18*mm, rightMargin=18*mm, topMargin=32*mm, bottomMargin=18*mm,
-        title=f"Sanction Letter - {app_id}",
-        author="GreenLight Credit",
-    )
-    styles = getSampleStyleSheet()
-    styles.add(ParagraphStyle(
-        name="H1",
-        parent=styles["Heading1"],
-        fontName="Helvetica-Bold",
-        fontSize=18,
-        leading=22,
-        textColor=colors.black,
-        spaceAfter=8,
-    ))
-    styles.add(ParagraphStyle(
-        name="Sub",
-        parent=styles["Normal"],
-        fontSize=9.5,
-        textColor=colors.grey,
-    ))
-    styles.add(ParagraphStyle(
-        name="Kpi",
-        parent=styles["Normal"],
-        fontName="Helvetica-Bold",
-        fontSize=12,
-        textColor=colors.Color(0.25, 0.93, 0.62),
-    ))
-    styles.add(ParagraphStyle(
-        name="SecHead",
-        parent=styles["Heading2"],
-        fontName="Helvetica-Bold",
-        fontSize=12,
-        textColor=colors.black,
-        spaceBefore=10, spaceAfter=6,
-    ))
     story = []
 
     story.append(_chip("Provisional Sanction"))
@@ -180,7 +166,7 @@ def build_sanction_pdf(
     # KPI row
     kpi = Table([
         ["Sanction amount", "Tenure", "EMI", "APR"],
-        [inr(amount), f"{months} months", inr(emi), f"{round(apr*100, 2)}% p.a."],
+        [money["amount"], f"{months} months", money["emi"], f"{round(apr*100, 2)}% p.a."],
     ], colWidths=[90*mm/2, 50*mm/2, 50*mm/2, 50*mm/2])
     kpi.setStyle(TableStyle([
         ("BACKGROUND", (0, 0), (-1, 0), colors.Color(0.96, 0.97, 0.99)),
@@ -226,14 +212,14 @@ def build_sanction_pdf(
     story.append(Spacer(1, 10))
     story.append(Paragraph("Key Fact Statement (KFS)", styles["SecHead"]))
     kfs_rows = [
-        ["Sanction amount", inr(amount)],
-        ["Processing fee", inr(processing_fee)],
-        ["GST on PF", inr(gst)],
-        ["Net disbursal (to bank)", inr(disbursal)],
+        ["Sanction amount", money["amount"]],
+        ["Processing fee", money["processing_fee"]],
+        ["GST on PF", money["gst"]],
+        ["Net disbursal (to bank)", money["net_disbursal"]],
         ["Tenure", f"{months} months"],
         ["APR", f"{round(apr*100, 2)}% p.a."],
-        ["EMI (indicative)", inr(emi)],
-        ["Total payable (indicative)", inr(total)],
+        ["EMI (indicative)", money["emi"]],
+        ["Total payable (indicative)", money["total_payable"]],
     ]
     k = Table(kfs_rows, colWidths=[60*mm, 95*mm])
     k.setStyle(TableStyle([
@@ -303,7 +289,15 @@ def build_sanction_pdf(
     ]))
     story.append(bottom)
 
-    doc.build(story, onFirstPage=_header_footer, onLaterPages=_header_footer)
+    # Build PDF
+    render_pdf(
+        str(pdf_path), story,
+        onFirstPage=_header_footer, onLaterPages=_header_footer,
+        pagesize=A4,
+        leftMargin=18*mm, rightMargin=18*mm, topMargin=32*mm, bottomMargin=18*mm,
+        title=f"Sanction Letter - {app_id}",
+        author="GreenLight Credit",
+    )
 
-    served = f"/files/{pdf_path.name}"
+    served = served_url(pdf_path, root=out_dir)
     return served, kfs
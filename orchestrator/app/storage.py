@@ -0,0 +1,53 @@
+# app/storage.py
+"""
+Layout of generated documents under DATA_DIR (served at /files).
+
+    DATA_DIR/docs/<h0h1>/<h2h3>/sanction_<session>.pdf
+    DATA_DIR/docs/<h0h1>/<h2h3>/kfs_<session>.json
+
+where h = sha1(session_id). Two levels of 256 keep every directory small no
+matter how many letters accumulate. Files written before sharding stay in
+the DATA_DIR root and are still served; retention cleans both.
+
+DATA_DIR also holds non-public files (pre-approved source and index,
+REFDATA_DIR generations, traces), so /files serves only documents: see
+DocFiles.
+"""
+import hashlib
+import os
+from pathlib import Path
+
+from fastapi import HTTPException
+from fastapi.staticfiles import StaticFiles
+
+DATA_DIR = Path("/app/data")  # mounted in docker-compose
+DOCS = "docs"
+
+def shard(session_id: str) -> str:
+    h = hashlib.sha1(session_id.encode("utf-8")).hexdigest()
+    return f"{h[:2]}/{h[2:4]}"
+
+def doc_path(prefix: str, session_id: str, ext: str, root: Path = DATA_DIR) -> Path:
+    p = root / DOCS / shard(session_id) / f"{prefix}_{session_id}.{ext}"
+    p.parent.mkdir(parents=True, exist_ok=True)
+    return p
+
+def served_url(path: Path, root: Path = DATA_DIR) -> str:
+    return "/files/" + path.relative_to(root).as_posix()
+
+LEGACY_PREFIXES = ("sanction_", "kfs_")
+
+def is_document(rel: str) -> bool:
+    """True for paths (relative to DATA_DIR) that /files may serve."""
+    parts = rel.replace(os.sep, "/").split("/")
+    if len(parts) == 1:
+        return parts[0].startswith(LEGACY_PREFIXES)
+    return len(parts) == 4 and parts[0] == DOCS and parts[3].startswith(LEGACY_PREFIXES)
+
+class DocFiles(StaticFiles):
+    """StaticFiles over DATA_DIR that 404s anything but generated documents."""
+
+    async def get_response(self, path: str, scope):
+        if not is_document(path):
+            raise HTTPException(status_code=404)
+        return await super().get_response(path, scope)
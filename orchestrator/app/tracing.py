@@ -0,0 +1,204 @@
+# app/tracing.py
+"""
+In-process tracing with tail-based sampling.
+
+    with span("agent.underwriting.run", session=sid):
+        ...
+
+Spans nest through a ContextVar, so they follow the request across `await`,
+Starlette's threadpool and the adapter pool (resilience.call submits with a
+copied context). All spans of a trace are buffered on the root. When the root
+ends, the trace is kept if it failed, if it took at least TRACE_SLOW_MS, or
+with probability TRACE_SAMPLE_RATE. Kept traces are handed to a background
+exporter:
+
+    TRACE_EXPORT=file:/app/data/traces.jsonl        one JSON trace per line
+    TRACE_EXPORT=otlp:http://collector:4318/v1/traces   OTLP/HTTP JSON
+
+Empty TRACE_EXPORT keeps ids and headers but exports nothing.
+"""
+import json
+import logging
+import queue
+import random
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+
+from app.config import settings
+
+log = logging.getLogger(__name__)
+
+MAX_SPANS_PER_TRACE = 2000
+TRACE_HEADER = "X-Trace-Id"
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start_ns", "end_ns", "attrs", "error", "trace")
+
+    def __init__(self, name: str, parent: Optional["Span"], attrs: Dict[str, Any]):
+        self.name = name
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent else None
+        self.trace_id = parent.trace_id if parent else f"{random.getrandbits(128):032x}"
+        self.trace: "_Trace" = parent.trace if parent else _Trace()
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attrs = attrs
+        self.error: Optional[str] = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id,
+            "name": self.name, "start_ns": self.start_ns, "end_ns": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attrs": self.attrs, "error": self.error,
+        }
+
+class _Trace:
+    __slots__ = ("spans", "closed", "error", "lock")
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self.closed = False
+        self.error = False
+        self.lock = threading.Lock()
+
+    def add(self, s: Span):
+        with self.lock:
+            # late spans (e.g. an abandoned hedged call) after the root closed are dropped
+            if not self.closed and len(self.spans) < MAX_SPANS_PER_TRACE:
+                self.spans.append(s)
+            if s.error:
+                self.error = True
+
+_current: ContextVar[Optional[Span]] = ContextVar("span", default=None)
+
+def current_trace_id() -> Optional[str]:
+    s = _current.get()
+    return s.trace_id if s else None
+
+@contextmanager
+def span(name: str, **attrs):
+    parent = _current.get()
+    s = Span(name, parent, attrs)
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        s.end_ns = time.time_ns()
+        s.trace.add(s)
+        if parent is None:
+            _finish(s)
+
+def start_span(name: str, **attrs) -> Optional[Span]:
+    """Leaf span for callback-style code (SQLAlchemy events); pair with end_span.
+    Returns None outside a trace so background work does not start traces of its own."""
+    parent = _current.get()
+    return Span(name, parent, attrs) if parent is not None else None
+
+def end_span(s: Optional[Span], error: Optional[str] = None):
+    if s is None:
+        return
+    s.error = error
+    s.end_ns = time.time_ns()
+    s.trace.add(s)
+
+# ---------- sampling + export ----------
+_queue: "queue.Queue[List[dict]]" = queue.Queue(maxsize=1000)
+_exporter: Optional[threading.Thread] = None
+
+def _finish(root: Span):
+    t = root.trace
+    with t.lock:
+        t.closed = True
+        spans = list(t.spans)
+        failed = t.error
+    if not settings.trace_export:
+        return
+    slow = (root.end_ns - root.start_ns) / 1e6 >= settings.trace_slow_ms
+    if not (failed or slow or random.random() < settings.trace_sample_rate):
+        return
+    _ensure_exporter()
+    try:
+        _queue.put_nowait([s.to_dict() for s in spans])
+    except queue.Full:
+        log.warning("trace export queue full; dropping trace %s", root.trace_id)
+
+def _ensure_exporter():
+    global _exporter
+    if _exporter is None:
+        _exporter = threading.Thread(target=_export_loop, name="trace-exporter", daemon=True)
+        _exporter.start()
+
+def _otlp_body(spans: List[dict]) -> bytes:
+    def attr(k, v):
+        return {"key": k, "value": {"stringValue": str(v)}}
+    return json.dumps({"resourceSpans": [{
+        "resource": {"attributes": [attr("service.name", "greenlight-orchestrator")]},
+        "scopeSpans": [{"scope": {"name": "app.tracing"}, "spans": [{
+            "traceId": s["trace_id"], "spanId": s["span_id"], "parentSpanId": s["parent_id"] or "",
+            "name": s["name"], "kind": 1,
+            "startTimeUnixNano": str(s["start_ns"]), "endTimeUnixNano": str(s["end_ns"]),
+            "attributes": [attr(k, v) for k, v in s["attrs"].items()],
+            "status": {"code": 2, "message": s["error"]} if s["error"] else {"code": 1},
+        } for s in spans]}],
+    }]}).encode("utf-8")
+
+def _export_loop():
+    kind, _, target = settings.trace_export.partition(":")
+    while True:
+        spans = _queue.get()
+        try:
+            if kind == "file":
+                with open(target, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"trace_id": spans[0]["trace_id"], "spans": spans}, default=str) + "\n")
+            elif kind == "otlp":
+                req = urllib.request.Request(target, data=_otlp_body(spans),
+                                             headers={"Content-Type": "application/json"}, method="POST")
+                urllib.request.urlopen(req, timeout=5).close()
+        except Exception:
+            log.exception("trace export failed")
+
+# ---------- integrations ----------
+def instrument_engine(engine) -> None:
+    """One span per SQL statement."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._span = start_span("db.query", statement=statement[:200])
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        end_span(getattr(context, "_span", None))
+
+    @event.listens_for(engine, "handle_error")
+    def _error(ctx):
+        if ctx.execution_context is not None:
+            end_span(getattr(ctx.execution_context, "_span", None), error=str(ctx.original_exception))
+
+def add_tracing(app: FastAPI) -> None:
+    """Root span per HTTP request; the trace id goes back in X-Trace-Id."""
+
+    @app.middleware("http")
+    async def _trace(request: Request, call_next):
+        with span(f"http {request.method} {request.url.path}", method=request.method, path=request.url.path) as s:
+            response = await call_next(request)
+            s.set(status=response.status_code)
+            if response.status_code >= 500:
+                s.error = f"HTTP {response.status_code}"
+        response.headers[TRACE_HEADER] = s.trace_id
+        return response
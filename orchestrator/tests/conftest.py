@@ -0,0 +1,18 @@
+import os
+import tempfile
+
+# point the app at a throwaway SQLite file before anything imports app.models
+_DB_DIR = tempfile.mkdtemp(prefix="orch-test-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_DB_DIR}/test.db")
+
+import pytest  # noqa: E402
+
+from app.models import init_db  # noqa: E402
+
+init_db()
+
+@pytest.fixture
+def db():
+    from app.models import SessionLocal
+    with SessionLocal() as s:
+        yield s
@@ -0,0 +1,36 @@
+import pytest
+
+from app.agents import master, sanction
+from app.config import settings
+from app.events import rebuild
+from app.models import Session
+from app.storage import doc_path, served_url
+
+FORM = {"name": "Asha", "mobile": "9000000001", "pan_last4": "1234",
+        "desired_amount": 150000, "tenure": 24, "salary": 60000}
+
+@pytest.fixture
+def docs(tmp_path, monkeypatch):
+    monkeypatch.setattr(sanction, "doc_path", lambda prefix, sid, ext: doc_path(prefix, sid, ext, root=tmp_path))
+    monkeypatch.setattr(sanction, "served_url", lambda p: served_url(p, root=tmp_path))
+    return tmp_path
+
+def _run(session_id):
+    master.handle_message(session_id, "I consent", {})
+    return master.handle_message(session_id, "apply", FORM)
+
+def test_sanction_writes_letter(docs, db):
+    out = _run("master_ok")
+    assert out["pdf"].startswith("/files/docs/")
+    assert db.get(Session, "master_ok").state["stage"] == "done"
+    assert list(docs.rglob("sanction_master_ok.pdf"))
+
+def test_pdf_over_budget_goes_to_manual_review(docs, db, monkeypatch):
+    monkeypatch.setattr(settings, "pdf_max_bytes", 1000)
+    out = _run("master_pdf_budget")
+    assert out["handoff"] is True
+    state = db.get(Session, "master_pdf_budget").state
+    assert state["stage"] == "manual_review"
+    assert state["sanction"]["ok"] is False
+    assert rebuild("master_pdf_budget") == state
+    assert not list(docs.rglob("sanction_master_pdf_budget.pdf"))
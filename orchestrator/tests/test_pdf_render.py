@@ -0,0 +1,107 @@
+"""
+Regression budget for the sanction letter with a 36-month amortisation
+schedule, built by the app's own builder (app.pdf.sanction_letter.generate_pdf)
+from an app.quotes quote. Byte size is pinned with a small tolerance (the
+letter embeds its render time); peak memory is a ceiling with headroom for
+ReportLab/Python version drift. If a change moves these numbers on purpose,
+update the pins.
+"""
+import threading
+
+import pytest
+
+from app.config import settings
+from app.pdf import render, sanction_letter
+from app.pdf.render import PdfBudgetExceeded
+from app.pdf.sanction_letter import USE_DV, generate_pdf
+from app.quotes import get_quote, schedule
+
+AMOUNT, MONTHS = 150000, 36
+
+# (bytes, peak memory ceiling) with the embedded DejaVu subset vs. built-in Helvetica
+PINNED = {True: (48035, 1_800_000), False: (6052, 800_000)}
+PINNED_BYTES, MAX_PEAK_MEM = PINNED[USE_DV]
+BYTES_TOLERANCE = 0.05
+
+def _kfs(quote):
+    # same shape as app.agents.sanction builds from the underwriting decision
+    return {
+        "Name": "Asha Rao", "PAN last 4": "1234",
+        "Amount": quote["amount"], "Tenure": quote["tenure"], "EMI": quote["emi"],
+        "APR": f'{quote["apr"]}%', "MandateID": "MDT-s36",
+    }
+
+@pytest.fixture
+def stats(monkeypatch):
+    """Capture render_pdf's stats from inside generate_pdf."""
+    seen = []
+    real = sanction_letter.render_pdf
+
+    def spy(*args, **kwargs):
+        out = real(*args, **kwargs)
+        seen.append(out)
+        return out
+
+    monkeypatch.setattr(sanction_letter, "render_pdf", spy)
+    return seen
+
+def _render(path, with_schedule=True):
+    quote, _ = get_quote(AMOUNT, MONTHS)
+    return generate_pdf(str(path), _kfs(quote), schedule(quote) if with_schedule else None)
+
+@pytest.fixture
+def track_mem(monkeypatch):
+    monkeypatch.setattr(settings, "pdf_track_mem", True)
+
+def test_36_month_letter_size_and_memory(tmp_path, track_mem, stats):
+    _render(tmp_path / "sanction_s36.pdf")
+    (st,) = stats
+    assert st["bytes"] == pytest.approx(PINNED_BYTES, rel=BYTES_TOLERANCE)
+    assert 0 < st["peak_mem"] <= MAX_PEAK_MEM
+    assert [p.name for p in tmp_path.iterdir()] == ["sanction_s36.pdf"]
+
+def test_schedule_spans_pages_and_balances(tmp_path, stats):
+    quote, preset = get_quote(AMOUNT, MONTHS)
+    rows = schedule(quote)
+    assert preset and len(rows) == MONTHS
+    assert sum(r[2] for r in rows) == AMOUNT and rows[-1][4] == 0
+    _render(tmp_path / "with.pdf")
+    _render(tmp_path / "without.pdf", with_schedule=False)
+    assert stats[0]["bytes"] > stats[1]["bytes"]
+
+def test_page_streams_are_compressed(tmp_path, monkeypatch):
+    real = render.SimpleDocTemplate
+    sizes = {}
+    for compression in (1, 0):
+        monkeypatch.setattr(render, "SimpleDocTemplate",
+                            lambda *a, _c=compression, **k: real(*a, **{**k, "pageCompression": _c}))
+        path = tmp_path / f"c{compression}.pdf"
+        _render(path)
+        sizes[compression] = path.stat().st_size
+    assert sizes[1] < sizes[0] * 0.6
+
+def test_over_budget_render_leaves_no_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "pdf_max_bytes", 1000)
+    with pytest.raises(PdfBudgetExceeded):
+        _render(tmp_path / "big.pdf")
+    assert list(tmp_path.iterdir()) == []
+
+def test_peak_mem_cap_enforced_for_concurrent_renders(tmp_path, monkeypatch, stats):
+    monkeypatch.setattr(settings, "pdf_max_peak_mem", MAX_PEAK_MEM)
+    errors = []
+
+    def run(i):
+        try:
+            _render(tmp_path / f"c{i}.pdf")
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    assert len(stats) == 4
+    assert all(st["peak_mem"] is not None and 0 < st["peak_mem"] <= MAX_PEAK_MEM for st in stats)
+    assert not render._mem_lock.locked()
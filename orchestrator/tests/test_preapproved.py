@@ -0,0 +1,34 @@
+import json
+import os
+import time
+
+from app.services import preapproved
+from app.services.preapproved import build_index, index_path, make_key, refresh
+
+def _source(path, limit):
+    path.write_text(json.dumps([{"mobile": "9000000001", "pan_tail": "1234", "preapproved": limit}]))
+    return path
+
+def test_refresh_never_builds(tmp_path):
+    src = _source(tmp_path / "customers.json", 300000)
+    assert refresh(src) is None
+    assert not index_path(src).exists()
+
+def test_refresh_opens_and_swaps_built_index(tmp_path):
+    src = _source(tmp_path / "customers.json", 300000)
+    build_index(src, index_path(src))
+    key = make_key("9000000001", "1234")
+    assert refresh(src).get(key) == 300000
+
+    _source(src, 450000)
+    later = time.time() + 5
+    os.utime(src, (later, later))
+    # a newer source alone is not picked up on the request path...
+    assert refresh(src).get(key) == 300000
+    # ...only an index rebuilt out of band is
+    build_index(src, index_path(src))
+    assert refresh(src).get(key) == 450000
+
+def test_missing_source_and_index(tmp_path):
+    assert refresh(tmp_path / "none.json") is None
+    assert preapproved._index is None
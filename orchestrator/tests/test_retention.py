@@ -0,0 +1,47 @@
+import os
+import time
+
+import pytest
+
+from app import retention
+from app.config import settings
+from app.models import Session
+from app.storage import doc_path
+
+OLD = time.time() - 10 * 86400
+
+def _old_file(path):
+    path.write_text("x")
+    os.utime(path, (OLD, OLD))
+    return path
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(retention, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(retention, "_cursor", 0)
+    monkeypatch.setattr(retention, "_flat_cursor", "")
+    monkeypatch.setattr(settings, "doc_retention_days", 1)
+    monkeypatch.setattr(settings, "doc_archive_dir", "")
+    monkeypatch.setattr(settings, "doc_expire_done", False)
+    return tmp_path
+
+def test_kept_flat_files_do_not_starve_shards(data_dir, monkeypatch, db):
+    monkeypatch.setattr(settings, "gc_max_files", 3)
+    for i in range(5):
+        sid = f"ret_done_{i}"
+        db.merge(Session(id=sid, state={"stage": "done"}))
+        _old_file(data_dir / f"sanction_{sid}.pdf")
+    db.commit()
+    expired = _old_file(doc_path("sanction", "ret_gone", "pdf", root=data_dir))
+
+    for _ in range(3):
+        retention.run_once()
+    assert not expired.exists()
+    assert all((data_dir / f"sanction_ret_done_{i}.pdf").exists() for i in range(5))
+
+def test_flat_cursor_covers_every_file(data_dir, monkeypatch):
+    monkeypatch.setattr(settings, "gc_max_files", 4)
+    flat = [_old_file(data_dir / f"kfs_ret_flat_{i}.json") for i in range(5)]
+    for _ in range(3):
+        retention.run_once()
+    assert not any(p.exists() for p in flat)
@@ -145,11 +145,41 @@ export default function ChatWidget({ api = API_DEFAULT }) {
     }
   };
 
-  const { emi, total, interest } = emiCalc(
-    form.desired_amount,
-    0.18,
-    form.tenure
-  );
+  // instant server-side offer preview; local estimate until it arrives
+  const [quote, setQuote] = useState(null);
+  useEffect(() => {
+    const ctrl = new AbortController();
+    const t = setTimeout(async () => {
+      try {
+        const qs = new URLSearchParams({
+          amount: String(form.desired_amount),
+          tenure: String(form.tenure),
+        });
+        const res = await fetch(`${ORCH_ORIGIN}/api/quote?${qs}`, {
+          signal: ctrl.signal,
+        });
+        setQuote(res.ok ? await res.json() : null);
+      } catch (e) {
+        if (e.name !== "AbortError") setQuote(null);
+      }
+    }, 150);
+    return () => {
+      clearTimeout(t);
+      ctrl.abort();
+    };
+  }, [form.desired_amount, form.tenure]);
+
+  const local = emiCalc(form.desired_amount, 0.18, form.tenure);
+  const { emi, total, interest } =
+    quote &&
+    quote.amount === form.desired_amount &&
+    quote.tenure === form.tenure
+      ? {
+          emi: quote.emi,
+          total: quote.total_payable,
+          interest: quote.total_payable - quote.amount,
+        }
+      : local;
 
   // styles
   const s = {